@@ -0,0 +1,97 @@
+# 攒批执行的异步任务
+import inspect
+import json
+import logging
+
+from celery import Task
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('django')
+
+
+class BatchedTask(Task):
+    """
+    攒批任务基类：delay()不直接投递到broker，而是写入redis缓冲队列，
+    同一时间窗口内只投递一次flush任务，缓冲队列每攒够batch_size条再立即投递一次，由flush任务批量取出处理
+    apply_async()和直接调用保持Celery原有的逐条执行行为
+    """
+    # redis缓冲队列的key
+    batch_key = None
+    # 攒批时间窗口，单位：秒
+    batch_window = 1
+    # 缓冲队列每攒够多少条立即投递flush任务，None表示只按时间窗口投递
+    batch_size = None
+    # 批量处理的任务名
+    flush_task = None
+    # 缓冲队列所在的redis库
+    batch_redis_alias = 'verify_code'
+
+    def make_batch_item(self, *args, **kwargs):
+        """
+        缓冲队列中保存的数据，默认为按任务函数签名排列的全部参数值，关键字参数和默认值也转成位置参数
+        参数与任务函数签名不符时抛出TypeError
+        """
+        bound = inspect.signature(self.run).bind(*args, **kwargs)
+        bound.apply_defaults()
+        return list(bound.arguments.values())
+
+    def delay(self, *args, **kwargs):
+        redis_conn = get_redis_connection(self.batch_redis_alias)
+        pl = redis_conn.pipeline()
+        pl.rpush(self.batch_key, json.dumps(self.make_batch_item(*args, **kwargs)))
+        # flush任务丢失时，标记过期后下一次delay会重新投递
+        pl.set(self.batch_key + '_scheduled', 1, nx=True, ex=self.batch_window * 10)
+        length, scheduled = pl.execute()
+        if scheduled:
+            self.app.send_task(self.flush_task, countdown=self.batch_window)
+        if self.batch_size and length % self.batch_size == 0:
+            # 攒够一批，不必等待时间窗口
+            self.app.send_task(self.flush_task)
+
+
+def pop_batch(redis_conn, key, size):
+    """
+    从缓冲队列中原子地取出至多size条数据
+    :return: 数据列表
+    """
+    pl = redis_conn.pipeline()
+    pl.lrange(key, 0, size - 1)
+    pl.ltrim(key, size, -1)
+    items, _ = pl.execute()
+    return [json.loads(item.decode()) for item in items]
+
+
+def drain_batches(task, size):
+    """
+    flush任务中调用：先清除投递标记，再分批取空缓冲队列
+    清除标记之后写入的数据会触发新的flush任务，不会遗漏
+    :param task: BatchedTask任务对象
+    :param size: 每批最多条数
+    :return: 生成器，每次产出一批数据
+    """
+    redis_conn = get_redis_connection(task.batch_redis_alias)
+    redis_conn.delete(task.batch_key + '_scheduled')
+    while True:
+        items = pop_batch(redis_conn, task.batch_key, size)
+        if not items:
+            break
+        yield items
+
+
+def record_batch_results(task, results):
+    """
+    记录flush任务中每条数据的处理结果：每条写一行日志，成功、失败条数累计到redis hash <batch_key>_results
+    Celery不保存任务返回值，批量结果只能在这里查看
+    :param results: [{'result': 0表示成功, ...}, ...]
+    """
+    if not results:
+        return
+    counts = {'sent': 0, 'failed': 0}
+    for result in results:
+        counts['sent' if result['result'] == 0 else 'failed'] += 1
+        logger.info('%s: %s' % (task.name, json.dumps(result, ensure_ascii=False)))
+    pl = get_redis_connection(task.batch_redis_alias).pipeline()
+    for field, count in counts.items():
+        if count:
+            pl.hincrby(task.batch_key + '_results', field, count)
+    pl.execute()
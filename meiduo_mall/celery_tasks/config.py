@@ -1,4 +1,42 @@
 # Celery配置文件
+from kombu import Queue
 
 # 指定消息队列的位置
 broker_url = 'redis://127.0.0.1/10'
+
+# 短信和邮件分别使用独立队列，邮件积压不会拖慢有效期只有300秒的短信验证码
+# 每个队列单独启动worker，按队列设置并发数：
+#   celery -A celery_tasks.main worker -l info -Q sms -c 20 -n sms@%h
+#   celery -A celery_tasks.main worker -l info -Q email -c 4 -n email@%h
+#   celery -A celery_tasks.main worker -l info -Q celery -n default@%h
+task_default_queue = 'celery'
+task_queues = (
+    Queue('sms'),
+    Queue('email'),
+    Queue('celery'),
+)
+task_routes = {
+    'send_sms_code': {'queue': 'sms'},
+    'flush_sms_batch': {'queue': 'sms', 'priority': 0},
+    'send_verify_email': {'queue': 'email'},
+    'flush_email_batch': {'queue': 'email'},
+}
+
+# redis按优先级拆分队列，0为最高优先级；未指定优先级的任务使用task_default_priority
+broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+    # 任务执行完才确认，执行时间和countdown都要小于visibility_timeout，否则会被重复投递
+    'visibility_timeout': 3600,
+}
+task_default_priority = 5
+
+# 每个worker进程只预取一个任务，长任务不会占住后面的短任务
+worker_prefetch_multiplier = 1
+
+# 任务执行完成后再确认，worker异常退出时任务重新投递
+task_acks_late = True
+task_reject_on_worker_lost = True
+
+# 短信、邮件任务都不读取执行结果，不写结果后端
+task_ignore_result = True
@@ -0,0 +1,5 @@
+# 邮件攒批时间窗口，单位：秒
+EMAIL_BATCH_WINDOW = 1
+
+# 每批最多发送的邮件数
+EMAIL_BATCH_SIZE = 100
@@ -1,28 +1,55 @@
 import logging
 
-from django.core.mail import send_mail
-from django.conf import settings
+from celery_tasks.batching import BatchedTask, drain_batches, record_batch_results
+from celery_tasks.email.utils import make_email, smtp_connection
 from celery_tasks.main import celery_app
+from . import constants
 
 logger = logging.getLogger('django')
 
+
+def make_verify_email(to_email, verify_url):
+    """构造验证邮件"""
+    return make_email("美多商城邮箱验证", 'verify_email', {'to_email': to_email, 'verify_url': verify_url}, [to_email])
+
+
 # bind: 保证task对象会作为第一个参数自动传入
 # name： 异步任务别名
 # retry_backoff： 异常自动重试的时间间隔 第n次（retry_backoff * 2^(n-1)）s
 # max_retries: 异常自动重试次数的上限
+# send_verify_email.delay()写入redis缓冲队列，由flush_email_batch复用同一条SMTP连接批量发送；apply_async()仍然逐封发送
 
 
-@celery_app.task(bind=True, name='send_verify_email', retry_backoff=3)
+@celery_app.task(bind=True, name='send_verify_email', retry_backoff=3, base=BatchedTask, batch_key='email_batch',
+                 batch_window=constants.EMAIL_BATCH_WINDOW, flush_task='flush_email_batch')
 def send_verify_email(self, to_email, verify_url):
     """定义发送验证邮件的任务"""
-    subject = "美多商城邮箱验证"
-    html_message = '<p>尊敬的用户您好！</p>' \
-                   '<p>感谢您使用美多商城。</p>' \
-                   '<p>您的邮箱为：%s 。请点击此链接激活您的邮箱：</p>' \
-                   '<p><a href="%s">%s<a></p>' % (to_email, verify_url, verify_url)
     try:
-        send_mail(subject, "", settings.EMAIL_FROM, [to_email], html_message=html_message)
+        smtp_connection.send(make_verify_email(to_email, verify_url))
     except Exception as e:
         logger.error(e)
         raise self.retry(exc=e, max_retries=3)
 
+
+def _send_one(item):
+    to_email, verify_url = item
+    try:
+        smtp_connection.send(make_verify_email(to_email, verify_url))
+        result = 0
+    except Exception as e:
+        logger.error('验证邮件发送失败：%s %s' % (to_email, e))
+        # 发送失败的邮件交给send_verify_email逐封重试
+        send_verify_email.apply_async((to_email, verify_url), countdown=send_verify_email.retry_backoff)
+        result = -1
+    return {'email': to_email, 'result': result}
+
+
+@celery_app.task(name='flush_email_batch')
+def flush_email_batch():
+    """批量发送缓冲队列中的验证邮件，记录并返回每个收件人的发送结果"""
+    results = []
+    for items in drain_batches(send_verify_email, constants.EMAIL_BATCH_SIZE):
+        sent = [_send_one(item) for item in items]
+        record_batch_results(send_verify_email, sent)
+        results.extend(sent)
+    return results
@@ -0,0 +1,122 @@
+import socket
+import socketserver
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django_redis import get_redis_connection
+
+from celery_tasks.email import tasks
+from celery_tasks.email.utils import smtp_connection
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """本地假SMTP服务器：记录每条连接收到的邮件，拒收reject@开头的收件人"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections.append(self.connection)
+        self.reply('220 stub')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                break
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 stub')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                if line.partition('<')[2].startswith('reject@'):
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(line.partition('<')[2].rstrip('>'))
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages.append((self.client_address[1], recipients))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                break
+            else:
+                self.reply('250 OK')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0), StubSMTPHandler)
+        self.connections = []
+        self.messages = []
+
+    def drop_connections(self):
+        """模拟服务端关闭空闲连接"""
+        for connection in self.connections:
+            connection.shutdown(socket.SHUT_RDWR)
+
+
+class FlushEmailBatchTest(SimpleTestCase):
+    """复用SMTP连接批量发送验证邮件"""
+
+    def setUp(self):
+        self.server = StubSMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        settings = override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                     EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.server_address[1],
+                                     EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_FROM='meiduo@example.com')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.redis_conn = get_redis_connection(tasks.send_verify_email.batch_redis_alias)
+        self.redis_conn.delete('email_batch', 'email_batch_scheduled', 'email_batch_results')
+
+    def tearDown(self):
+        smtp_connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def queue(self, *emails):
+        with mock.patch.object(tasks.send_verify_email.app, 'send_task'):
+            for email in emails:
+                tasks.send_verify_email.delay(email, 'http://127.0.0.1:8000/emails/verification/?token=x')
+
+    def flush(self):
+        with mock.patch.object(tasks.send_verify_email, 'apply_async') as apply_async:
+            return tasks.flush_email_batch(), apply_async
+
+    def test_one_connection_per_batch(self):
+        emails = ['user%d@example.com' % i for i in range(10)]
+        self.queue(*emails)
+        results, apply_async = self.flush()
+        self.assertEqual(results, [{'email': email, 'result': 0} for email in emails])
+        self.assertEqual([recipients for port, recipients in self.server.messages], [[email] for email in emails])
+        self.assertEqual(len({port for port, recipients in self.server.messages}), 1)
+        self.assertFalse(apply_async.called)
+        self.assertEqual(self.redis_conn.hgetall('email_batch_results'), {b'sent': b'10'})
+
+    def test_rejected_recipient(self):
+        self.queue('user@example.com', 'reject@example.com')
+        results, apply_async = self.flush()
+        self.assertEqual(results, [{'email': 'user@example.com', 'result': 0},
+                                   {'email': 'reject@example.com', 'result': -1}])
+        # 失败的邮件交给send_verify_email逐封重试
+        self.assertEqual(apply_async.call_args[0][0][0], 'reject@example.com')
+        self.assertEqual(self.redis_conn.hgetall('email_batch_results'), {b'sent': b'1', b'failed': b'1'})
+
+    def test_reconnect(self):
+        self.queue('user1@example.com')
+        self.flush()
+        self.server.drop_connections()
+        self.queue('user2@example.com')
+        results, apply_async = self.flush()
+        self.assertEqual(results, [{'email': 'user2@example.com', 'result': 0}])
+        self.assertEqual([recipients for port, recipients in self.server.messages],
+                         [['user1@example.com'], ['user2@example.com']])
+        self.assertEqual(len(self.server.connections), 2)
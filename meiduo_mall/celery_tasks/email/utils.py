@@ -0,0 +1,97 @@
+import smtplib
+import socket
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+
+
+def render_email(template_name, context):
+    """
+    渲染邮件正文：templates/emails/<template_name>.txt和.html
+    模板由项目的Jinja2环境加载，每个进程只编译一次，字节码缓存在磁盘上
+    :return: (纯文本正文, HTML正文)
+    """
+    text = get_template('emails/%s.txt' % template_name).render(context)
+    html = get_template('emails/%s.html' % template_name).render(context)
+    return text, html
+
+
+def make_email(subject, template_name, context, to):
+    """
+    构造同时包含纯文本和HTML正文的邮件
+    :param to: 收件人列表
+    :return: EmailMultiAlternatives对象
+    """
+    text, html = render_email(template_name, context)
+    message = EmailMultiAlternatives(subject, text, settings.EMAIL_FROM, to)
+    message.attach_alternative(html, 'text/html')
+    return message
+
+
+class PersistentSMTPConnection(object):
+    """
+    每个worker进程复用一条SMTP连接，省去每封邮件的连接、握手和登录
+    连接在第一次发送时建立，之后一直保持；服务端断开时重连并重发一次
+    :param kwargs: 传给django.core.mail.get_connection的参数
+    """
+    # 这些错误说明连接已不可用，重连后重发；收件人被拒等其他错误直接抛出
+    reconnect_errors = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._connection is None:
+            connection = get_connection(**self.kwargs)
+            connection.open()
+            self._connection = connection
+        return self._connection
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def send(self, message):
+        """
+        发送一封邮件
+        :param message: EmailMessage对象
+        :return: 成功发送的邮件数
+        """
+        with self._lock:
+            try:
+                return self._open().send_messages([message])
+            except self.reconnect_errors:
+                self._close()
+            return self._open().send_messages([message])
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+# 当前worker进程共用的SMTP连接
+smtp_connection = PersistentSMTPConnection()
+
+
+if __name__ == '__main__':
+    import sys
+    import timeit
+
+    import django
+    import celery_tasks.main  # noqa: 设置DJANGO_SETTINGS_MODULE
+
+    django.setup()
+    if sys.argv[1:2] == ['bench']:
+        # 微基准：python -m celery_tasks.email.utils bench [次数]
+        number = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+        context = {'to_email': 'user@example.com', 'verify_url': 'http://127.0.0.1:8000/emails/verification/?token=x'}
+        seconds = timeit.timeit(lambda: render_email('verify_email', context), number=number)
+        print('render_email: %d emails in %.3fs, %.1f emails/s' % (number, seconds, number / seconds))
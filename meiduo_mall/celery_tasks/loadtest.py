@@ -0,0 +1,112 @@
+"""
+短信/邮件队列隔离的压测脚本：先向email队列灌入大量邮件任务，再逐条发送短信验证码，
+统计短信从入队到服务商收到的延迟。队列隔离生效时，短信延迟不随邮件积压增长
+
+准备：
+  1. 在worker使用的settings中把短信服务商换成假服务商，并写入记录文件：
+     SMS_PROVIDERS = [{'BACKEND': 'fake', 'OPTIONS': {'path': '/tmp/meiduo_sms.log'}}]
+     邮件后端换成不真正发信的后端，如 EMAIL_BACKEND = 'django.core.mail.backends.dummy.EmailBackend'
+  2. 按config.py中的命令分别启动sms和email队列的worker
+运行：
+  python -m celery_tasks.loadtest --emails 5000 --sms 200
+查看累计的短信丢弃数和发送结果：
+  python -m celery_tasks.loadtest --stats
+"""
+import argparse
+import json
+import os
+import time
+
+import celery_tasks.main  # noqa: 设置DJANGO_SETTINGS_MODULE
+from django.conf import settings
+
+
+def get_fake_sms_log():
+    for config in getattr(settings, 'SMS_PROVIDERS', []):
+        path = config.get('OPTIONS', {}).get('path')
+        if config['BACKEND'] == 'fake' and path:
+            return path
+    raise SystemExit('SMS_PROVIDERS中没有配置记录文件的fake服务商')
+
+
+def read_sms_log(path, offset):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        f.seek(offset)
+        return {message['to']: message['time'] for message in map(json.loads, f)}
+
+
+def print_stats():
+    """打印sms_drop_stats中累计的丢弃短信数和sms_batch_results中累计的发送结果"""
+    from django_redis import get_redis_connection
+    from celery_tasks.sms.tasks import SMS_DROP_STATS_KEY
+
+    redis_conn = get_redis_connection('verify_code')
+    for title, key in (('短信丢弃', SMS_DROP_STATS_KEY), ('短信发送结果', 'sms_batch_results')):
+        stats = {field.decode(): int(count) for field, count in redis_conn.hgetall(key).items()}
+        print('%s：%s' % (title, '，'.join('%s %d' % item for item in sorted(stats.items())) or '无'))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='短信/邮件队列隔离压测')
+    parser.add_argument('--emails', type=int, default=5000, help='灌入email队列的邮件任务数')
+    parser.add_argument('--sms', type=int, default=200, help='发送的短信数')
+    parser.add_argument('--interval', type=float, default=0.05, help='短信发送间隔，单位：秒')
+    parser.add_argument('--timeout', type=float, default=60, help='等待短信全部送达的最长时间，单位：秒')
+    parser.add_argument('--stats', action='store_true', help='只打印累计的短信丢弃数和发送结果')
+    args = parser.parse_args()
+
+    if args.stats:
+        print_stats()
+        return
+
+    from django_redis import get_redis_connection
+    from celery_tasks.email.tasks import send_verify_email
+    from celery_tasks.sms.tasks import send_sms_code
+    from verifications import constants
+
+    path = get_fake_sms_log()
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    # apply_async逐条投递，不经过攒批，让email队列积压
+    for i in range(args.emails):
+        send_verify_email.apply_async(('loadtest%d@example.com' % i, 'http://127.0.0.1:8000/emails/verification/'))
+
+    # 与SMSCodeView一致：先保存验证码，再带上失效时间投递，否则worker会把短信当作已失效丢弃
+    redis_conn = get_redis_connection('verify_code')
+    sent_at = {}
+    for i in range(args.sms):
+        mobile = '199%08d' % i
+        sms_code = '%06d' % i
+        redis_conn.setex('sms_%s' % mobile, constants.SMS_CODE_REDIS_EXPIRES, sms_code)
+        sent_at[mobile] = time.time()
+        send_sms_code.delay(mobile, sms_code, time.time() + constants.SMS_CODE_REDIS_EXPIRES)
+        time.sleep(args.interval)
+
+    deadline = time.time() + args.timeout
+    received = {}
+    while time.time() < deadline:
+        received = read_sms_log(path, offset)
+        if all(mobile in received for mobile in sent_at):
+            break
+        time.sleep(0.5)
+
+    latencies = [received[mobile] - sent_at[mobile] for mobile in sent_at if mobile in received]
+    print('邮件任务：%d，短信：%d，送达：%d' % (args.emails, args.sms, len(latencies)))
+    if latencies:
+        print('短信延迟：p50 %.3fs，p95 %.3fs，p99 %.3fs，max %.3fs' % (
+            percentile(latencies, 0.5), percentile(latencies, 0.95), percentile(latencies, 0.99), max(latencies)))
+    print_stats()
+
+
+if __name__ == '__main__':
+    import django
+
+    django.setup()
+    main()
@@ -8,4 +8,28 @@ SMS_CODE_REDIS_EXPIRES = 300
 SEND_SMS_TEMPLATE_ID = 1
 
 # 60s内是否重复发送的标记
-SEND_SMS_CODE_INTERVAL = 60
\ No newline at end of file
+SEND_SMS_CODE_INTERVAL = 60
+
+# 短信攒批时间窗口，单位：秒
+SMS_BATCH_WINDOW = 1
+
+# 每批最多发送的短信条数
+SMS_BATCH_SIZE = 100
+
+# 批量发送短信的并发线程数
+SMS_SEND_CONCURRENCY = 10
+
+# 每个短信服务商每秒最多请求数，所有worker进程合计
+SMS_PROVIDER_RATE_LIMIT = 50
+
+# 短信服务商熔断的错误率阈值
+SMS_CIRCUIT_FAILURE_THRESHOLD = 0.5
+
+# 短信服务商熔断的平均延迟阈值，单位：秒
+SMS_CIRCUIT_LATENCY_THRESHOLD = 3
+
+# 短信服务商熔断前至少统计的请求数
+SMS_CIRCUIT_MIN_CALLS = 5
+
+# 短信服务商熔断时长，单位：秒
+SMS_CIRCUIT_RESET_TIMEOUT = 30
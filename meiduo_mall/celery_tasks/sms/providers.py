@@ -0,0 +1,190 @@
+# 短信服务商接口：任务代码只依赖SMSProvider，服务商SDK在第一次发送时才导入
+import collections
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import constants
+from .utils import CircuitBreaker, get_rate_limiter
+
+logger = logging.getLogger('django')
+
+
+class SMSProvider(object):
+    """短信服务商基类"""
+    # 服务商名称，用于限流等按服务商区分的场景
+    name = None
+
+    def send_template(self, to, datas, template_id):
+        """
+        发送模板短信
+        :param to: 手机号
+        :param datas: 模板短信内容数据，格式为列表
+        :param template_id: 模板编号
+        :return: 0表示成功，-1表示失败
+        """
+        raise NotImplementedError
+
+
+class YuntongxunProvider(SMSProvider):
+    """
+    容联云通讯，未传入的账号参数使用ccp_sms中的默认配置
+    :param timeout: 请求超时，单位：秒，默认使用SDK共用的连接池
+    """
+    name = 'yuntongxun'
+
+    def __init__(self, account_sid=None, account_token=None, app_id=None,
+                 server_ip=None, server_port=None, soft_version=None, timeout=None):
+        self.account_sid = account_sid
+        self.account_token = account_token
+        self.app_id = app_id
+        self.server_ip = server_ip
+        self.server_port = server_port
+        self.soft_version = soft_version
+        self.timeout = timeout
+        self._rest = None
+        self._lock = threading.Lock()
+
+    def get_rest(self):
+        if self._rest is None:
+            with self._lock:
+                if self._rest is None:
+                    self._rest = self._make_rest()
+        return self._rest
+
+    def _make_rest(self):
+        from celery_tasks.sms.yuntongxun import ccp_sms
+        from celery_tasks.sms.yuntongxun.CCPRestSDK import REST
+        from celery_tasks.sms.yuntongxun.transport import PooledTransport
+
+        transport = PooledTransport(timeout=self.timeout) if self.timeout else None
+        rest = REST(self.server_ip or ccp_sms._serverIP, self.server_port or ccp_sms._serverPort,
+                    self.soft_version or ccp_sms._softVersion, transport)
+        rest.setAccount(self.account_sid or ccp_sms._accountSid, self.account_token or ccp_sms._accountToken)
+        rest.setAppId(self.app_id or ccp_sms._appId)
+        return rest
+
+    def send_template(self, to, datas, template_id):
+        result = self.get_rest().sendTemplateSMS(to, datas, template_id)
+        if result.get('statusCode') == '000000':
+            return 0
+        logger.error('云通讯短信发送失败：%s' % result)
+        return -1
+
+
+class FakeProvider(SMSProvider):
+    """
+    压测和本地开发使用的假短信服务商，不发出真实短信
+    :param path: 记录文件，每条短信追加一行JSON；为空时只保存在内存中
+    :param latency: 模拟的请求延迟，单位：秒
+    :param fail_every: 每fail_every条返回一次失败，0表示不失败
+    :param maxlen: 内存中最多保留的短信条数
+    """
+    name = 'fake'
+
+    def __init__(self, path=None, latency=0, fail_every=0, maxlen=10000):
+        self.path = path
+        self.latency = latency
+        self.fail_every = fail_every
+        self.messages = collections.deque(maxlen=maxlen)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def send_template(self, to, datas, template_id):
+        if self.latency:
+            time.sleep(self.latency)
+        message = {'to': to, 'datas': datas, 'template_id': template_id, 'time': time.time()}
+        with self._lock:
+            self.count += 1
+            if self.fail_every and self.count % self.fail_every == 0:
+                return -1
+            self.messages.append(message)
+            if self.path:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(message) + '\n')
+        return 0
+
+
+# 服务商注册表：SMS_PROVIDERS中的BACKEND可以是这里的名称，也可以是类的导入路径
+PROVIDER_CLASSES = {
+    'yuntongxun': YuntongxunProvider,
+    'fake': FakeProvider,
+}
+
+# 未配置SMS_PROVIDERS时只使用云通讯
+DEFAULT_SMS_PROVIDERS = [
+    {'BACKEND': 'yuntongxun'},
+]
+
+
+def register_provider(name, provider_class):
+    """注册短信服务商"""
+    PROVIDER_CLASSES[name] = provider_class
+
+
+class FailoverSender(object):
+    """
+    按健康分在多个短信服务商之间故障转移：
+    每次发送按健康分从高到低尝试未熔断的服务商，失败或异常时换下一个
+    :param entries: [(provider, breaker, rate_limit), ...]，健康分相同时按配置顺序
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    @property
+    def providers(self):
+        return [provider for provider, breaker, rate_limit in self.entries]
+
+    def send_template(self, to, datas, template_id):
+        entries = sorted(self.entries, key=lambda entry: -entry[1].health)
+        for provider, breaker, rate_limit in entries:
+            if not breaker.allow():
+                continue
+            get_rate_limiter(provider.name, rate_limit).acquire()
+            start = time.monotonic()
+            try:
+                result = provider.send_template(to, datas, template_id)
+            except Exception as e:
+                logger.error(e)
+                result = -1
+            breaker.record(result == 0, time.monotonic() - start)
+            if result == 0:
+                return 0
+            logger.warning('短信服务商%s发送失败：%s' % (provider.name, to))
+        logger.error('没有可用的短信服务商：%s' % to)
+        return -1
+
+
+def _make_entry(config):
+    backend = config['BACKEND']
+    provider_class = PROVIDER_CLASSES.get(backend) or import_string(backend)
+    provider = provider_class(**config.get('OPTIONS', {}))
+    if config.get('NAME'):
+        provider.name = config['NAME']
+    breaker = CircuitBreaker(
+        failure_threshold=config.get('FAILURE_THRESHOLD', constants.SMS_CIRCUIT_FAILURE_THRESHOLD),
+        latency_threshold=config.get('LATENCY_THRESHOLD', constants.SMS_CIRCUIT_LATENCY_THRESHOLD),
+        min_calls=config.get('MIN_CALLS', constants.SMS_CIRCUIT_MIN_CALLS),
+        reset_timeout=config.get('RESET_TIMEOUT', constants.SMS_CIRCUIT_RESET_TIMEOUT),
+    )
+    return provider, breaker, config.get('RATE_LIMIT', constants.SMS_PROVIDER_RATE_LIMIT)
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender():
+    """按SMS_PROVIDERS配置创建故障转移发送器，每个进程只创建一次"""
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                configs = getattr(settings, 'SMS_PROVIDERS', DEFAULT_SMS_PROVIDERS)
+                _sender = FailoverSender([_make_entry(config) for config in configs])
+    return _sender
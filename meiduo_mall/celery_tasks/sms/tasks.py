@@ -1,13 +1,101 @@
 # 定义任务
-from celery_tasks.sms.yuntongxun.ccp_sms import CCP
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django_redis import get_redis_connection
+
+from celery_tasks.batching import BatchedTask, drain_batches, record_batch_results
+from celery_tasks.sms.providers import get_sender
 from . import constants
 from celery_tasks.main import celery_app
 
+logger = logging.getLogger('django')
+
+# 丢弃的过期短信计数，hash字段：expired 超过截止时间，stale 验证码已失效或已被新验证码替换
+SMS_DROP_STATS_KEY = 'sms_drop_stats'
+
+
+def _send_sms_code(mobile, sms_code):
+    """调用短信服务商发送一条短信验证码，服务商故障时自动切换"""
+    return get_sender().send_template(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES // 60], constants.SEND_SMS_TEMPLATE_ID)
+
+
+def _check_items(items):
+    """
+    发送前丢弃已经没有意义的短信，不产生任何网络请求：
+    超过截止时间的，以及verify_code库中sms_<mobile>已失效或已被新验证码替换的
+    :param items: [[mobile, sms_code, deadline], ...]，deadline可以省略
+    :return: (需要发送的数据列表, 丢弃结果列表)
+    """
+    now = time.time()
+    valid, dropped = [], []
+    for item in items:
+        deadline = item[2] if len(item) > 2 else None
+        if deadline is not None and deadline <= now:
+            dropped.append({'mobile': item[0], 'result': -1, 'dropped': 'expired'})
+        else:
+            valid.append(item)
+
+    redis_conn = get_redis_connection('verify_code')
+    pl = redis_conn.pipeline()
+    if valid:
+        for item in valid:
+            pl.get('sms_%s' % item[0])
+        codes = pl.execute()
+        items, valid = valid, []
+        for item, code in zip(items, codes):
+            if code is not None and code.decode() == item[1]:
+                valid.append(item)
+            else:
+                dropped.append({'mobile': item[0], 'result': -1, 'dropped': 'stale'})
+
+    if dropped:
+        for result in dropped:
+            pl.hincrby(SMS_DROP_STATS_KEY, result['dropped'], 1)
+        pl.execute()
+        logger.warning('丢弃过期短信验证码%d条' % len(dropped))
+    return valid, dropped
+
 
 # 使用装饰器装饰异步任务，保证celery识别任务
-@celery_app.task(name='send_sms_code')
-def send_sms_code(mobile, sms_code):
-    """发送短息验证码异步任务"""
-    send_ret = CCP().send_template_sms(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES // 60], constants.SEND_SMS_TEMPLATE_ID)
+# send_sms_code.delay()写入redis缓冲队列，由flush_sms_batch批量发送；apply_async()仍然逐条发送
+@celery_app.task(name='send_sms_code', base=BatchedTask, batch_key='sms_batch', batch_window=constants.SMS_BATCH_WINDOW,
+                 batch_size=constants.SMS_BATCH_SIZE, flush_task='flush_sms_batch')
+def send_sms_code(mobile, sms_code, deadline=None):
+    """
+    发送短息验证码异步任务
+    :param deadline: 截止时间戳，超过后不再发送，一般为验证码失效的时间
+    """
+    valid, dropped = _check_items([[mobile, sms_code, deadline]])
+    if dropped:
+        return dropped[0]['result']
+    send_ret = _send_sms_code(mobile, sms_code)
     return send_ret
 
+
+def _send_one(item):
+    mobile, sms_code = item[:2]
+    try:
+        result = _send_sms_code(mobile, sms_code)
+    except Exception as e:
+        logger.error(e)
+        result = -1
+    if result != 0:
+        logger.error('短信发送失败：%s' % mobile)
+    return {'mobile': mobile, 'result': result}
+
+
+@celery_app.task(name='flush_sms_batch')
+def flush_sms_batch():
+    """批量发送缓冲队列中的短信验证码，记录并返回每条短信的发送结果"""
+    results = []
+    with ThreadPoolExecutor(max_workers=constants.SMS_SEND_CONCURRENCY) as executor:
+        for items in drain_batches(send_sms_code, constants.SMS_BATCH_SIZE):
+            items, dropped = _check_items(items)
+            results.extend(dropped)
+            sent = list(executor.map(_send_one, items))
+            # 丢弃的短信已经计入sms_drop_stats
+            record_batch_results(send_sms_code, sent)
+            results.extend(sent)
+    return results
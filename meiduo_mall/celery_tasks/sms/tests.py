@@ -0,0 +1,189 @@
+import asyncio
+import http.client
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+from django_redis import get_redis_connection
+
+from celery_tasks.sms.tasks import send_sms_code
+from celery_tasks.sms.utils import RateLimiter
+from celery_tasks.sms.yuntongxun.aio import AsyncPooledTransport
+from celery_tasks.sms.yuntongxun.transport import PooledTransport
+from celery_tasks.sms.yuntongxun.xmltojson import xmltojson
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """本地假服务商：记录每个请求使用的客户端端口，按路径模拟不同的服务端行为"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, self.client_address[1], body))
+        if self.path == '/drop':
+            # 收到请求后不响应直接断开
+            self.close_connection = True
+            return
+        data = b'<Response><statusCode>000000</statusCode></Response>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if self.path == '/close':
+            # 响应后关闭连接，但不发送Connection: close，客户端连接池中留下失效的空闲连接
+            self.close_connection = True
+
+
+class StubServerMixin(object):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PooledTransportTest(StubServerMixin, SimpleTestCase):
+    """keep-alive连接池"""
+
+    def setUp(self):
+        super(PooledTransportTest, self).setUp()
+        self.transport = PooledTransport(timeout=5)
+
+    def tearDown(self):
+        self.transport.close()
+        super(PooledTransportTest, self).tearDown()
+
+    def test_reuses_connection(self):
+        for i in range(5):
+            data = self.transport.request('POST', self.url + '/ok', b'%d' % i)
+            self.assertIn(b'000000', data)
+        ports = {port for path, port, body in self.server.requests}
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(len(ports), 1)
+
+    def test_replaces_stale_connection(self):
+        self.transport.request('POST', self.url + '/close', b'1')
+        # 等服务端关闭连接
+        time.sleep(0.1)
+        data = self.transport.request('POST', self.url + '/ok', b'2')
+        self.assertIn(b'000000', data)
+        self.assertEqual([body for path, port, body in self.server.requests], [b'1', b'2'])
+        self.assertNotEqual(self.server.requests[0][1], self.server.requests[1][1])
+
+    def test_no_retry_after_request_sent(self):
+        self.transport.request('POST', self.url + '/ok', b'1')
+        with self.assertRaises(http.client.RemoteDisconnected):
+            self.transport.request('POST', self.url + '/drop', b'2')
+        # 请求已经送达服务商，不能重发
+        self.assertEqual([body for path, port, body in self.server.requests], [b'1', b'2'])
+
+
+class AsyncPooledTransportTest(StubServerMixin, SimpleTestCase):
+    """asyncio keep-alive连接池"""
+
+    def setUp(self):
+        super(AsyncPooledTransportTest, self).setUp()
+        self.transport = AsyncPooledTransport(timeout=5)
+
+    async def send(self, *paths):
+        try:
+            return [await self.transport.request('POST', self.url + path, b'%d' % i) for i, path in enumerate(paths)]
+        finally:
+            self.transport.close()
+
+    def test_reuses_connection(self):
+        for data in asyncio.run(self.send('/ok', '/ok', '/ok')):
+            self.assertIn(b'000000', data)
+        ports = {port for path, port, body in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(ports), 1)
+
+    def test_consecutive_event_loops(self):
+        # 同一个连接池先后在两个事件循环中使用
+        self.transport.close = lambda: None
+        self.assertIn(b'000000', asyncio.run(self.send('/ok'))[0])
+        self.assertIn(b'000000', asyncio.run(self.send('/ok'))[0])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_replaces_stale_connection(self):
+        async def send():
+            await self.transport.request('POST', self.url + '/close', b'1')
+            # 等服务端关闭连接
+            await asyncio.sleep(0.1)
+            return await self.send('/ok')
+
+        self.assertIn(b'000000', asyncio.run(send())[0])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertNotEqual(self.server.requests[0][1], self.server.requests[1][1])
+
+    def test_no_retry_after_request_sent(self):
+        with self.assertRaises(asyncio.IncompleteReadError):
+            asyncio.run(self.send('/ok', '/drop'))
+        # 请求已经送达服务商，不能重发
+        self.assertEqual([body for path, port, body in self.server.requests], [b'0', b'1'])
+
+
+class XmlToJsonTest(SimpleTestCase):
+    """云通讯响应解析：与原实现的输出一致，xmltojson_expected.json由原实现逐个样本在新进程中生成"""
+
+    def test_matches_old_output(self):
+        with open(os.path.join(FIXTURES_DIR, 'xmltojson_expected.json'), encoding='utf-8') as f:
+            expected = json.load(f)
+        for name, outputs in expected.items():
+            with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+                data = f.read()
+            for method, output in outputs.items():
+                with self.subTest(fixture=name, method=method):
+                    self.assertEqual(getattr(xmltojson(), method)(data), output)
+
+    def test_no_state_between_calls(self):
+        with open(os.path.join(FIXTURES_DIR, 'sub_account_list.xml'), 'rb') as f:
+            data = f.read()
+        self.assertEqual(xmltojson().main(data), xmltojson().main(data))
+        self.assertEqual(len(xmltojson().main(data)['SubAccount']), 3)
+
+
+class RateLimiterTest(SimpleTestCase):
+    """redis令牌桶"""
+
+    def setUp(self):
+        get_redis_connection('verify_code').delete('test_rate_limit')
+
+    def test_shared_between_processes(self):
+        # 两个限流器实例模拟两个worker进程，合计每秒不超过rate次
+        limiters = [RateLimiter('test_rate_limit', 100), RateLimiter('test_rate_limit', 100)]
+        start = time.monotonic()
+        for i in range(100):
+            for limiter in limiters:
+                limiter.acquire()
+        # 桶内初始100个令牌，其余100个按每秒100个补充
+        self.assertGreaterEqual(time.monotonic() - start, 0.9)
+
+
+class BatchItemTest(SimpleTestCase):
+    """缓冲队列中保存的任务参数"""
+
+    def test_keyword_arguments(self):
+        self.assertEqual(send_sms_code.make_batch_item('13800000001', '123456', deadline=100),
+                         ['13800000001', '123456', 100])
+        self.assertEqual(send_sms_code.make_batch_item('13800000001', sms_code='123456'),
+                         ['13800000001', '123456', None])
+
+    def test_unknown_argument(self):
+        with self.assertRaises(TypeError):
+            send_sms_code.make_batch_item('13800000001', '123456', expires=100)
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('django')
+
+
+# redis令牌桶：按redis服务器时间补充令牌，所有worker进程共用同一个桶
+# 令牌足够时取走一个并返回0，否则返回需要等待的秒数
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('time')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens = tonumber(redis.call('hget', KEYS[1], 'tokens'))
+local updated_at = tonumber(redis.call('hget', KEYS[1], 'updated_at'))
+if tokens == nil or updated_at == nil then
+    tokens = capacity
+    updated_at = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('hmset', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RateLimiter(object):
+    """
+    基于redis的令牌桶：限制所有worker进程对同一短信服务商每秒的总请求数
+    :param key: 令牌桶的redis key
+    :param rate: 每秒发放的令牌数
+    :param burst: 桶容量，默认等于rate
+    :param redis_alias: 令牌桶所在的redis库
+    """
+
+    def __init__(self, key, rate, burst=None, redis_alias='verify_code'):
+        self.key = key
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.redis_alias = redis_alias
+
+    def acquire(self):
+        """取一个令牌，令牌不足时等待；redis不可用时不限流"""
+        redis_conn = get_redis_connection(self.redis_alias)
+        while True:
+            try:
+                wait = float(redis_conn.eval(TOKEN_BUCKET_SCRIPT, 1, self.key, self.rate, self.capacity))
+            except Exception as e:
+                logger.error(e)
+                return
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+# 每个短信服务商一个限流器
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider, rate):
+    """获取短信服务商的限流器，令牌桶按服务商名称保存在redis中"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.setdefault(provider, RateLimiter('sms_rate_limit_%s' % provider, rate))
+    return limiter
+
+
+class CircuitBreaker(object):
+    """
+    按错误率和延迟熔断的断路器，并给出服务商健康分
+    错误率和延迟都按指数加权移动平均统计，超过阈值后熔断reset_timeout秒，
+    之后半开，只放行一次试探请求：成功则恢复，失败则继续熔断
+    :param failure_threshold: 熔断的错误率阈值
+    :param latency_threshold: 熔断的平均延迟阈值，单位：秒
+    :param min_calls: 统计样本不足min_calls次时不熔断
+    :param reset_timeout: 熔断时长，单位：秒
+    :param alpha: 移动平均的权重
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=0.5, latency_threshold=3, min_calls=5, reset_timeout=30, alpha=0.2):
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.state = self.CLOSED
+        self.error_rate = 0.0
+        self.latency = 0.0
+        self.calls = 0
+        self._updated_at = time.monotonic()
+        self._opened_at = 0
+        self._probing = False
+
+    @property
+    def health(self):
+        """健康分，0~1，越大越健康；一段时间没有请求后逐渐恢复，让排在后面的服务商有机会重新分到流量"""
+        decay = 0.5 ** ((time.monotonic() - self._updated_at) / self.reset_timeout)
+        return (1 - self.error_rate * decay) / (1 + self.latency * decay / self.latency_threshold)
+
+    def allow(self):
+        """是否放行本次请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, success, latency):
+        """记录一次请求结果"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if success and latency < self.latency_threshold:
+                    self._reset()
+                else:
+                    self._open()
+                return
+
+            self.calls += 1
+            self._updated_at = time.monotonic()
+            self.error_rate += self.alpha * ((0.0 if success else 1.0) - self.error_rate)
+            self.latency += self.alpha * (latency - self.latency)
+            if self.calls >= self.min_calls and (
+                    self.error_rate >= self.failure_threshold or self.latency >= self.latency_threshold):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
@@ -13,9 +13,12 @@
 from hashlib import md5
 import base64
 import datetime
-from urllib import request as urllib2
 import json
 from .xmltojson import xmltojson
+from .transport import PooledTransport
+
+# 所有REST实例共用的keep-alive连接池
+default_transport = PooledTransport()
 
 
 class REST:
@@ -35,11 +38,13 @@ class REST:
     # @param serverIP       必选参数    服务器地址
     # @param serverPort     必选参数    服务器端口
     # @param softVersion    必选参数    REST版本号
-    def __init__(self, ServerIP, ServerPort, SoftVersion):
+    # @param transport      可选参数    HTTP传输层，默认使用共享的keep-alive连接池
+    def __init__(self, ServerIP, ServerPort, SoftVersion, transport=None):
 
         self.ServerIP = ServerIP
         self.ServerPort = ServerPort
         self.SoftVersion = SoftVersion
+        self.transport = transport or default_transport
 
     # 设置主帐号
     # @param AccountSid  必选参数    主帐号
@@ -74,47 +79,46 @@ class REST:
         print(data)
         print('********************************')
 
-    # 创建子账号
-    # @param friendlyName   必选参数      子帐号名称
-    def CreateSubAccount(self, friendlyName):
-
+    # 生成请求URL和auth
+    # @param path  必选参数    Accounts/{AccountSid}之后的路径，如/SMS/TemplateSMS
+    # @param query 可选参数    sig之后追加的查询参数
+    def makeUrl(self, path, query=''):
         self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
+        # 时间戳只在本次请求内使用，多线程共用一个实例时不会互相覆盖
+        batch = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        self.Batch = batch
         # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
+        signature = self.AccountSid + self.AccountToken + batch
         sig = md5(signature.encode()).hexdigest().upper()
         # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SubAccounts?sig=" + sig
+        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + path + "?sig=" + sig + query
         # 生成auth
-        src = self.AccountSid + ":" + self.Batch
+        src = self.AccountSid + ":" + batch
         auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
-        # xml格式
-        body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
-            <friendlyName>%s</friendlyName>\
-            </SubAccount>\
-            ''' % (self.AppId, friendlyName)
+        return url, auth
 
-        if self.BodyType == 'json':
+    # 解析响应包体
+    def parse(self, data, bodyType=None, xmlMain='main'):
+        if (bodyType or self.BodyType) == 'json':
             # json格式
-            body = '''{"friendlyName": "%s", "appId": "%s"}''' % (friendlyName, self.AppId)
+            return json.loads(data)
+        else:
+            # xml格式
+            xtj = xmltojson()
+            return getattr(xtj, xmlMain)(data)
+
+    # 发送请求并解析响应，所有接口都经由transport发出
+    # @param body 可选参数    包体，为None时发送GET请求
+    def request(self, url, auth, body=None, headers=None, bodyType=None, xmlMain='main'):
+        headers = dict(headers or self.getHttpHeaders())
+        headers["Authorization"] = auth
         data = ''
-        req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
+            if body is None:
+                data = self.transport.request('GET', url, None, headers)
             else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+                data = self.transport.request('POST', url, body.encode(), headers)
+            locations = self.parse(data, bodyType, xmlMain)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -123,26 +127,28 @@ class REST:
                 self.log(url, body, data)
             return {'172001': '网络错误'}
 
+    # 创建子账号
+    # @param friendlyName   必选参数      子帐号名称
+    def CreateSubAccount(self, friendlyName):
+
+        url, auth = self.makeUrl("/SubAccounts")
+        # xml格式
+        body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
+            <friendlyName>%s</friendlyName>\
+            </SubAccount>\
+            ''' % (self.AppId, friendlyName)
+
+        if self.BodyType == 'json':
+            # json格式
+            body = '''{"friendlyName": "%s", "appId": "%s"}''' % (friendlyName, self.AppId)
+        return self.request(url, auth, body)
+
     #  获取子帐号
     # @param startNo  可选参数    开始的序号，默认从0开始
     # @param offset 可选参数     一次查询的最大条数，最小是1条，最大是100条
     def getSubAccounts(self, startNo, offset):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/GetSubAccounts?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/GetSubAccounts")
         # xml格式
         body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
             <startNo>%s</startNo><offset>%s</offset>\
@@ -152,49 +158,14 @@ class REST:
         if self.BodyType == 'json':
             # json格式
             body = '''{"appId": "%s", "startNo": "%s", "offset": "%s"}''' % (self.AppId, startNo, offset)
-        data = ''
-        req.data = body.encode()
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # 子帐号信息查询
     # @param friendlyName 必选参数   子帐号名称
 
     def querySubAccount(self, friendlyName):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/QuerySubAccountByName?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/QuerySubAccountByName")
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
@@ -203,27 +174,7 @@ class REST:
             ''' % (self.AppId, friendlyName)
         if self.BodyType == 'json':
             body = '''{"friendlyName": "%s", "appId": "%s"}''' % (friendlyName, self.AppId)
-        data = ''
-        req.data = body.encode()
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # 发送模板短信
     # @param to  必选参数     短信接收彿手机号码集合,用英文逗号分开
@@ -231,21 +182,7 @@ class REST:
     # @param tempId 必选参数    模板Id
     def sendTemplateSMS(self, to, datas, tempId):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SMS/TemplateSMS?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/SMS/TemplateSMS")
         # 创建包体
         b = ''
         for a in datas:
@@ -261,27 +198,7 @@ class REST:
                 b += '"%s",' % (a)
             b += ']'
             body = '''{"to": "%s", "datas": %s, "templateId": "%s", "appId": "%s"}''' % (to, b, tempId, self.AppId)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # 外呼通知
     # @param to 必选参数    被叫号码
@@ -300,21 +217,7 @@ class REST:
     def landingCall(self, to, mediaName, mediaTxt, displayNum, playTimes, respUrl, userData, maxCallTime, speed, volume,
                     pitch, bgsound):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/Calls/LandingCalls?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/Calls/LandingCalls")
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><LandingCall>\
@@ -328,27 +231,7 @@ class REST:
             body = '''{"to": "%s", "mediaName": "%s","mediaTxt": "%s","appId": "%s","displayNum": "%s","playTimes": "%s","respUrl": "%s","userData": "%s","maxCallTime": "%s","speed": "%s","volume": "%s","pitch": "%s","bgsound": "%s"}''' % (
             to, mediaName, mediaTxt, self.AppId, displayNum, playTimes, respUrl, userData, maxCallTime, speed, volume,
             pitch, bgsound)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # 语音验证码
     # @param verifyCode  必选参数   验证码内容，为数字和英文字母，不区分大小写，长度4-8位
@@ -361,22 +244,7 @@ class REST:
 
     def voiceVerify(self, verifyCode, playTimes, to, displayNum, respUrl, lang, userData):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/Calls/VoiceVerify?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/Calls/VoiceVerify")
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><VoiceVerify>\
@@ -387,27 +255,7 @@ class REST:
             # if this model is Json ..then do next code 
             body = '''{"appId": "%s", "verifyCode": "%s","playTimes": "%s","to": "%s","respUrl": "%s","displayNum": "%s","lang": "%s","userData": "%s"}''' % (
             self.AppId, verifyCode, playTimes, to, respUrl, displayNum, lang, userData)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # IVR外呼
     # @param number  必选参数     待呼叫号码，为Dial节点的属性
@@ -416,21 +264,8 @@ class REST:
 
     def ivrDial(self, number, userdata, record):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch;
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/ivr/dial?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        req.add_header("Accept", "application/xml")
-        req.add_header("Content-Type", "application/xml;charset=utf-8")
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/ivr/dial")
+        headers = {"Accept": "application/xml", "Content-Type": "application/xml;charset=utf-8"}
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?>
@@ -439,41 +274,14 @@ class REST:
                     <Dial number="%s"  userdata="%s" record="%s"></Dial>
                 </Request>
             ''' % (self.AppId, number, userdata, record)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-            xtj = xmltojson()
-            locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body, headers, bodyType='xml')
 
     # 话单下载
     # @param date   必选参数    day 代表前一天的数据（从00:00 – 23:59），目前只支持按天查询
     # @param keywords  可选参数     客户的查询条件，由客户自行定义并提供给云通讯平台。默认不填忽略此参数
     def billRecords(self, date, keywords):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/BillRecords?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/BillRecords")
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><BillRecords>\
@@ -483,89 +291,21 @@ class REST:
         if self.BodyType == 'json':
             # if this model is Json ..then do next code 
             body = '''{"appId": "%s", "date": "%s","keywords": "%s"}''' % (self.AppId, date, keywords)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # 主帐号信息查询
 
     def queryAccountInfo(self):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/AccountInfo?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        body = ''
-        req.add_header("Authorization", auth)
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        url, auth = self.makeUrl("/AccountInfo")
+        return self.request(url, auth)
 
     # 短信模板查询
     # @param templateId  必选参数   模板Id，不带此参数查询全部可用模板 
 
     def QuerySMSTemplate(self, templateId):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SMS/QuerySMSTemplate?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/SMS/QuerySMSTemplate")
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><Request>\
@@ -574,88 +314,22 @@ class REST:
         if self.BodyType == 'json':
             # if this model is Json ..then do next code 
             body = '''{"appId": "%s", "templateId": "%s"}''' % (self.AppId, templateId)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main2(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body, xmlMain='main2')
 
     # 呼叫结果查询
     # @param callsid   必选参数    呼叫ID
 
     def CallResult(self, callSid):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/CallResult?sig=" + sig + "&callsid=" + callSid
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        body = ''
-        req.add_header("Authorization", auth)
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        url, auth = self.makeUrl("/CallResult", "&callsid=" + callSid)
+        return self.request(url, auth)
 
     # 呼叫状态查询
     # @param callid   必选参数    一个由32个字符组成的电话唯一标识符
     # @param action      可选参数     查询结果通知的回调url地址 
     def QueryCallState(self, callid, action):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/ivr/call?sig=" + sig + "&callid=" + callid
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/ivr/call", "&callid=" + callid)
 
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><Request>\
@@ -665,78 +339,19 @@ class REST:
         if self.BodyType == 'json':
             # if this model is Json ..then do next code 
             body = '''{"Appid":"%s","QueryCallState":{"callid":"%s","action":"%s"}}''' % (self.AppId, callid, action)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.request(url, auth, body)
 
     # 语音文件上传
     # @param filename   必选参数    文件名
     # @param body      必选参数     二进制串
     def MediaFileUpload(self, filename, body):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/Calls/MediaFileUpload?sig=" + sig + "&appid=" + self.AppId + "&filename=" + filename
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        req.add_header("Authorization", auth)
+        url, auth = self.makeUrl("/Calls/MediaFileUpload", "&appid=" + self.AppId + "&filename=" + filename)
         if self.BodyType == 'json':
-            req.add_header("Accept", "application/json")
-            req.add_header("Content-Type", "application/octet-stream")
-
+            headers = {"Accept": "application/json", "Content-Type": "application/octet-stream"}
         else:
-            req.add_header("Accept", "application/xml")
-            req.add_header("Content-Type", "application/octet-stream")
-
-        # 创建包体
-        req.data = body.encode()
-
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+            headers = {"Accept": "application/xml", "Content-Type": "application/octet-stream"}
+        return self.request(url, auth, body, headers)
 
     # 子帐号鉴权
     def subAuth(self):
@@ -790,12 +405,14 @@ class REST:
             print('172012')
             print('应用ID为空')
 
-    # 设置包头
-    def setHttpHeader(self, req):
+    # 包头
+    def getHttpHeaders(self):
         if self.BodyType == 'json':
-            req.add_header("Accept", "application/json")
-            req.add_header("Content-Type", "application/json;charset=utf-8")
-
+            return {"Accept": "application/json", "Content-Type": "application/json;charset=utf-8"}
         else:
-            req.add_header("Accept", "application/xml")
-            req.add_header("Content-Type", "application/xml;charset=utf-8")
+            return {"Accept": "application/xml", "Content-Type": "application/xml;charset=utf-8"}
+
+    # 设置包头
+    def setHttpHeader(self, req):
+        for key, value in self.getHttpHeaders().items():
+            req.add_header(key, value)
@@ -0,0 +1,190 @@
+# -*- coding: UTF-8 -*-
+# 云通讯REST SDK的asyncio版本：单个进程内可以同时发出数百个请求
+
+import asyncio
+import ssl
+import weakref
+from urllib.parse import urlsplit
+
+from .CCPRestSDK import REST
+from .transport import TransportError
+
+
+class AsyncPooledTransport(object):
+    """
+    基于asyncio streams的HTTP/1.1 keep-alive连接池
+    streams和Semaphore只能在创建它们的事件循环中使用，每个事件循环各自维护一份空闲连接和并发限制，
+    因此同一个实例可以在多次asyncio.run()之间共用
+    :param maxsize: 每个主机最多同时打开的连接数
+    :param timeout: 单次请求超时，单位：秒
+    :param context: HTTPS使用的SSLContext，默认ssl.create_default_context()
+    """
+
+    def __init__(self, maxsize=100, timeout=10, context=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.context = context or ssl.create_default_context()
+        # {loop: ({(scheme, host, port): [(reader, writer), ...]}, {(scheme, host, port): Semaphore})}
+        self._loops = weakref.WeakKeyDictionary()
+
+    def _get_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            # 已关闭的事件循环中的连接不能再使用，也无法在其他事件循环中关闭，直接丢弃
+            for closed in [closed for closed in self._loops.keys() if closed.is_closed()]:
+                del self._loops[closed]
+            state = self._loops[loop] = ({}, {})
+        return state
+
+    async def request(self, method, url, body=None, headers=None):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+
+        idle, semaphores = self._get_state()
+        semaphore = semaphores.get(key)
+        if semaphore is None:
+            semaphore = semaphores.setdefault(key, asyncio.Semaphore(self.maxsize))
+
+        async with semaphore:
+            return await asyncio.wait_for(self._request(idle.setdefault(key, []), key, method, path, body,
+                                                        headers or {}), self.timeout)
+
+    async def _request(self, idle, key, method, path, body, headers):
+        while True:
+            reused = False
+            while idle:
+                reader, writer = idle.pop()
+                # 服务端已关闭的空闲连接直接丢弃
+                if reader.at_eof() or writer.is_closing():
+                    writer.close()
+                    continue
+                reused = True
+                break
+            if not reused:
+                reader, writer = await self._open(key)
+
+            try:
+                self._write_request(writer, key, method, path, body, headers)
+                await writer.drain()
+            except (ConnectionResetError, BrokenPipeError):
+                writer.close()
+                # 复用的连接在发送请求时被服务端关闭，请求没有送达，换一条新连接重试
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+
+            try:
+                status, reason, keep_alive, data = await self._read_response(reader)
+            except BaseException:
+                # 请求已经发出，服务商可能已经处理，不能重发
+                writer.close()
+                raise
+            break
+
+        if keep_alive:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+        if status >= 400:
+            raise TransportError(status, reason)
+        return data
+
+    async def _open(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            return await asyncio.open_connection(host, port, ssl=self.context)
+        return await asyncio.open_connection(host, port)
+
+    @staticmethod
+    def _write_request(writer, key, method, path, body, headers):
+        scheme, host, port = key
+        lines = ['%s %s HTTP/1.1' % (method, path), 'Host: %s:%s' % (host, port), 'Connection: keep-alive']
+        for name, value in headers.items():
+            lines.append('%s: %s' % (name, value))
+        if body is not None:
+            lines.append('Content-Length: %d' % len(body))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if body is not None:
+            writer.write(body)
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readuntil(b'\r\n')
+        version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    # 跳过trailer
+                    while (await reader.readuntil(b'\r\n')) != b'\r\n':
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        else:
+            data = await reader.read()
+            keep_alive = False
+        return status, reason, keep_alive, data
+
+    def close(self):
+        """关闭当前事件循环中的所有空闲连接，在事件循环结束前调用"""
+        idle, semaphores = self._get_state()
+        for connections in idle.values():
+            for reader, writer in connections:
+                writer.close()
+        idle.clear()
+
+
+# 所有AsyncREST实例共用的连接池
+default_async_transport = AsyncPooledTransport()
+
+
+class AsyncREST(REST):
+    """
+    与REST接口相同的asyncio版本，所有接口方法都返回协程：
+    result = await rest.sendTemplateSMS(to, datas, tempId)
+    """
+
+    def __init__(self, ServerIP, ServerPort, SoftVersion, transport=None):
+        super(AsyncREST, self).__init__(ServerIP, ServerPort, SoftVersion, transport or default_async_transport)
+
+    # 发送请求并解析响应
+    async def request(self, url, auth, body=None, headers=None, bodyType=None, xmlMain='main'):
+        headers = dict(headers or self.getHttpHeaders())
+        headers["Authorization"] = auth
+        data = ''
+        try:
+            if body is None:
+                data = await self.transport.request('GET', url, None, headers)
+            else:
+                data = await self.transport.request('POST', url, body.encode(), headers)
+            locations = self.parse(data, bodyType, xmlMain)
+            if self.Iflog:
+                self.log(url, body, data)
+            return locations
+        except Exception as error:
+            if self.Iflog:
+                self.log(url, body, data)
+            return {'172001': '网络错误'}
@@ -0,0 +1,142 @@
+# -*- coding: UTF-8 -*-
+# 云通讯REST SDK的HTTP传输层
+
+import http.client
+import queue
+import select
+import ssl
+import threading
+from urllib import request as urllib2
+from urllib.parse import urlsplit
+
+
+class TransportError(Exception):
+    """HTTP响应状态码错误"""
+
+    def __init__(self, status, reason):
+        super(TransportError, self).__init__('%s %s' % (status, reason))
+        self.status = status
+        self.reason = reason
+
+
+class UrllibTransport(object):
+    """每次请求新建连接，与SDK原有的urlopen行为一致"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def request(self, method, url, body=None, headers=None):
+        req = urllib2.Request(url, data=body, headers=headers or {}, method=method)
+        res = urllib2.urlopen(req, timeout=self.timeout)
+        try:
+            return res.read()
+        finally:
+            res.close()
+
+    def close(self):
+        pass
+
+
+class PooledTransport(object):
+    """
+    keep-alive连接池：按(scheme, host, port)复用连接，省去每条短信的TCP和TLS握手
+    :param maxsize: 每个主机最多保留的空闲连接数
+    :param timeout: 连接和读取超时，单位：秒
+    :param context: HTTPS使用的SSLContext，默认ssl.create_default_context()
+    """
+
+    def __init__(self, maxsize=10, timeout=10, context=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.context = context or ssl.create_default_context()
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self, key):
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.setdefault(key, queue.LifoQueue(self.maxsize))
+        return pool
+
+    def _new_connection(self, scheme, host, port):
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.context)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    @staticmethod
+    def _is_stale(conn):
+        """空闲连接上出现可读事件说明服务端已经关闭连接"""
+        if conn.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _release(self, pool, conn):
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        pool = self._get_pool(key)
+
+        while True:
+            try:
+                conn = pool.get_nowait()
+            except queue.Empty:
+                conn = self._new_connection(parts.scheme, parts.hostname, port)
+                reused = False
+            else:
+                reused = True
+                if self._is_stale(conn):
+                    conn.close()
+                    continue
+
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+            except (ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # 复用的空闲连接可能已被服务端关闭，请求还没有发出去，换一条新连接重试
+                if reused:
+                    continue
+                raise
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+
+            try:
+                res = conn.getresponse()
+                data = res.read()
+            except (http.client.HTTPException, OSError):
+                # 请求已经发出，服务商可能已经处理，不重试，避免重复发送
+                conn.close()
+                raise
+            break
+
+        if res.will_close:
+            conn.close()
+        else:
+            self._release(pool, conn)
+
+        if res.status >= 400:
+            raise TransportError(res.status, res.reason)
+        return data
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
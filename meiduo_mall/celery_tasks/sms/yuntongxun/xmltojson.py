@@ -1,170 +1,90 @@
 # -*- coding: utf-8 -*-
 # python xml.etree.ElementTree
 
-import os
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 
 
-class xmltojson:
-    # global var
-    # show log
-    SHOW_LOG = True
-    # XML file
-    XML_PATH = None
-    a = {}
-    m = []
-
-    def get_root(self, path):
-        '''parse the XML file,and get the tree of the XML file
-        finally,return the root element of the tree.
-        if the XML file dose not exist,then print the information'''
-        # if os.path.exists(path):
-        # if SHOW_LOG:
-        # print('start to parse the file : [{}]'.format(path))
-        tree = ET.fromstring(path)
-        return tree
-        # else:
-        # print('the path [{}] dose not exist!'.format(path))
-
-    def get_element_tag(self, element):
-        '''return the element tag if the element is not None.'''
-        if element is not None:
-
-            return element.tag
+def xml_to_dict(xml, list_tag=None, rename=None):
+    """
+    无状态的云通讯响应解析：XMLPullParser一次遍历，每处理完一个二级元素就释放，内存占用有上限
+    :param xml: 响应包体，str、bytes或分块的bytes可迭代对象
+    :param list_tag: 响应中存在totalCount时，该标签的多个元素合并为列表
+    :param rename: 二级元素标签的重命名，如{'TemplateSMS': 'templateSMS'}
+    :return: dict，二级元素有子元素时为{标签: 文本}字典，否则为文本
+    """
+    if isinstance(xml, (str, bytes)):
+        xml = [xml]
+    rename = rename or {}
+
+    result = {}
+    items = []
+    has_total_count = False
+    root = None
+    depth = 0
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    for event, element in _read_events(parser, xml):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+
+        tag = element.tag
+        if tag == 'totalCount':
+            has_total_count = True
+        children = {child.tag: child.text for child in element}
+        if not children:
+            result[tag] = element.text
+        elif tag == list_tag:
+            items.append(children)
+            result[tag] = None
         else:
-            print('the element is None!')
+            result[rename.get(tag, tag)] = children
+        # 已处理的二级元素及其子元素不再保留
+        root.clear()
 
-    def get_element_attrib(self, element):
-        '''return the element attrib if the element is not None.'''
-        if element is not None:
+    if items:
+        result[list_tag] = items if has_total_count else items[-1]
+    return result
 
-            return element.attrib
-        else:
-            print('the element is None!')
 
-    def get_element_text(self, element):
-        '''return the text of the element.'''
-        if element is not None:
-            return element.text
-        else:
-            print('the element is None!')
+def _read_events(parser, chunks):
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
 
-    def get_element_children(self, element):
-        '''return the element children if the element is not None.'''
-        if element is not None:
 
-            return [c for c in element]
-        else:
-            print('the element is None!')
-
-    def get_elements_tag(self, elements):
-        '''return the list of tags of element's tag'''
-        if elements is not None:
-            tags = []
-            for e in elements:
-                tags.append(e.tag)
-            return tags
-        else:
-            print('the elements is None!')
-
-    def get_elements_attrib(self, elements):
-        '''return the list of attribs of element's attrib'''
-        if elements is not None:
-            attribs = []
-            for a in elements:
-                attribs.append(a.attrib)
-            return attribs
-        else:
-            print('the elements is None!')
-
-    def get_elements_text(self, elements):
-        '''return the dict of element'''
-        if elements is not None:
-            text = []
-            for t in elements:
-                text.append(t.text)
-            return dict(zip(self.get_elements_tag(elements), text))
-        else:
-            print('the elements is None!')
+class xmltojson:
+    """兼容原有调用方式：每次调用都返回新的字典，实例之间不共享任何状态"""
 
     def main(self, xml):
-        # root
-        root = self.get_root(xml)
-
-        # children
-        children = self.get_element_children(root)
-
-        children_tags = self.get_elements_tag(children)
-
-        children_attribs = self.get_elements_attrib(children)
-
-        i = 0
-
-        # 获取二级元素的每一个子节点的名称和值
-        for c in children:
-            p = 0
-            c_children = self.get_element_children(c)
-            dict_text = self.get_elements_text(c_children)
-            if dict_text:
-                # print (children_tags[i])
-                if children_tags[i] == 'TemplateSMS':
-                    self.a['templateSMS'] = dict_text
-                else:
-                    if children_tags[i] == 'SubAccount':
-                        k = 0
-
-                        for x in children:
-                            if children_tags[k] == 'totalCount':
-                                self.m.append(dict_text)
-                                self.a['SubAccount'] = self.m
-                                p = 1
-                            k = k + 1
-                        if p == 0:
-                            self.a[children_tags[i]] = dict_text
-                    else:
-                        self.a[children_tags[i]] = dict_text
-
-
-            else:
-                self.a[children_tags[i]] = c.text
-            i = i + 1
-        return self.a
+        return xml_to_dict(xml, list_tag='SubAccount', rename={'TemplateSMS': 'templateSMS'})
 
     def main2(self, xml):
-        # root
-        root = self.get_root(xml)
-
-        # children
-        children = self.get_element_children(root)
-
-        children_tags = self.get_elements_tag(children)
-
-        children_attribs = self.get_elements_attrib(children)
-
-        i = 0
-
-        # 获取二级元素的每一个子节点的名称和值
-        for c in children:
-            p = 0
-            c_children = self.get_element_children(c)
-            dict_text = self.get_elements_text(c_children)
-            if dict_text:
-                if children_tags[i] == 'TemplateSMS':
-                    k = 0
-
-                    for x in children:
-                        if children_tags[k] == 'totalCount':
-                            self.m.append(dict_text)
-                            self.a['TemplateSMS'] = self.m
-                            p = 1
-                        k = k + 1
-                    if p == 0:
-                        self.a[children_tags[i]] = dict_text
-                else:
-                    self.a[children_tags[i]] = dict_text
-
-            else:
-                self.a[children_tags[i]] = c.text
-            i = i + 1
-        return self.a
+        return xml_to_dict(xml, list_tag='TemplateSMS')
+
+
+if __name__ == '__main__':
+    import sys
+    import timeit
+
+    if sys.argv[1:2] == ['bench']:
+        # 微基准：python -m celery_tasks.sms.yuntongxun.xmltojson bench [次数]
+        number = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+        small = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>000000</statusCode>'
+                 b'<TemplateSMS><dateCreated>20260101120000</dateCreated><smsMessageSid>sid</smsMessageSid>'
+                 b'</TemplateSMS></Response>')
+        seconds = timeit.timeit(lambda: xmltojson().main(small), number=number)
+        print('main: %d responses in %.3fs, %.1f responses/s' % (number, seconds, number / seconds))
+
+        large = (b'<Response><statusCode>000000</statusCode><totalCount>5000</totalCount>' +
+                 b''.join(b'<SubAccount><subAccountSid>sid%d</subAccountSid></SubAccount>' % i for i in range(5000)) +
+                 b'</Response>')
+        seconds = timeit.timeit(lambda: xmltojson().main(large), number=10)
+        print('main: 5000 SubAccount response in %.3fs' % (seconds / 10))
@@ -0,0 +1,8 @@
+# 省市区数据版本号在redis中的key
+AREA_VERSION_KEY = 'area_version'
+
+# 进程内省市区树检查版本号的间隔，单位：秒
+AREA_VERSION_CHECK_INTERVAL = 5
+
+# 省市区数据在redis中的缓存有效期，单位：秒
+AREA_ROWS_CACHE_EXPIRES = 3600
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from areas.utils import expire_area_tree
+
+
+class Command(BaseCommand):
+    """
+    通知所有进程重新构建省市区树
+    直接用SQL导入或修改tb_areas不会触发模型信号，导入后执行：
+    python manage.py expire_area_tree
+    """
+    help = '递增省市区数据版本号，所有进程重新构建省市区树'
+
+    def handle(self, *args, **options):
+        expire_area_tree()
+        self.stdout.write('省市区数据版本号已更新')
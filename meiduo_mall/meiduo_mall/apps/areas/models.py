@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 # Create your models here.
 
@@ -15,3 +17,10 @@ class Area(models.Model):
 
     def __str__(self):
         return self.name
+
+
+@receiver([post_save, post_delete], sender=Area)
+def area_changed(sender, **kwargs):
+    """省市区数据变化时，通知所有进程重新构建省市区树；事务提交后再通知，避免其他进程读到提交前的数据"""
+    from areas.utils import expire_area_tree
+    transaction.on_commit(expire_area_tree)
@@ -1,3 +1,87 @@
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
 from django.test import TestCase
+from django_redis import get_redis_connection
+
+from areas.models import Area
+from areas.utils import get_area_tree, expire_area_tree
+from meiduo_mall.utils.cache import get_or_set, acquire_lock, release_lock
 
 # Create your tests here.
+
+
+class GetOrSetTest(TestCase):
+    """单飞缓存读取"""
+
+    def setUp(self):
+        self.key = 'test_%s' % uuid.uuid4().hex
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def tearDown(self):
+        cache.delete(self.key)
+
+    def loader(self):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return 'value'
+
+    def test_concurrent_misses_load_once(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_or_set(self.key, self.loader, 60)))
+                   for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 20)
+        self.assertEqual(self.calls, 1)
+
+    def test_waits_for_other_process(self):
+        # 模拟另一个进程持有加载锁，随后写入缓存
+        redis_conn = get_redis_connection('default')
+        token = acquire_lock(redis_conn, 'lock_%s' % self.key, 10)
+
+        def other_process():
+            time.sleep(0.2)
+            cache.set(self.key, ('other', 0, time.time() + 60), 60)
+            release_lock(redis_conn, 'lock_%s' % self.key, token)
+
+        thread = threading.Thread(target=other_process)
+        thread.start()
+        self.assertEqual(get_or_set(self.key, self.loader, 60), 'other')
+        thread.join()
+        self.assertEqual(self.calls, 0)
+
+    def test_release_only_own_lock(self):
+        redis_conn = get_redis_connection('default')
+        lock_key = 'lock_%s' % self.key
+        token = acquire_lock(redis_conn, lock_key, 10)
+        # 锁过期后被其他进程获取，原持有者释放时不能删除别人的锁
+        redis_conn.delete(lock_key)
+        other_token = acquire_lock(redis_conn, lock_key, 10)
+        release_lock(redis_conn, lock_key, token)
+        self.assertEqual(redis_conn.get(lock_key).decode(), other_token)
+        release_lock(redis_conn, lock_key, other_token)
+        self.assertIsNone(redis_conn.get(lock_key))
+
+
+class AreaTreeTest(TestCase):
+    """省市区树"""
+
+    def setUp(self):
+        province = Area.objects.create(name='广东省')
+        city = Area.objects.create(name='广州市', parent=province)
+        Area.objects.create(name='天河区', parent=city)
+        expire_area_tree()
+
+    def test_one_query_per_version(self):
+        with self.assertNumQueries(1):
+            tree = get_area_tree()
+        self.assertEqual([province['name'] for province in tree.province_list], ['广东省'])
+        with self.assertNumQueries(0):
+            get_area_tree()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from areas.models import Area
+from meiduo_mall.utils.cache import get_or_set
+from meiduo_mall.utils.response_code import RETCODE
+from . import constants
+
+logger = logging.getLogger('django')
+
+# 提前序列化好的响应：UTF-8 JSON字节串和强ETag
+AreaPayload = namedtuple('AreaPayload', ['body', 'etag'])
+
+
+def make_area_payload(data):
+    """将响应字典序列化为JSON字节串，并计算ETag"""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+    return AreaPayload(body, etag)
+
+
+class AreaTree(object):
+    """进程内只读的省市区树：一次查询构建，按id索引，子级列表提前序列化好"""
+
+    def __init__(self, version, rows):
+        self.version = version
+
+        names = {}
+        children = {}
+        for area_id, name, parent_id in rows:
+            names[area_id] = name
+            children.setdefault(parent_id, []).append({'id': area_id, 'name': name})
+
+        self._names = names
+        # 省份：parent为空的行政区划
+        self.province_list = tuple(children.get(None, ()))
+        # 城市或区县：{'id': 上级id, 'name': 上级名称, 'subs': [...]}
+        self._sub_data = {
+            area_id: {'id': area_id, 'name': name, 'subs': tuple(children.get(area_id, ()))}
+            for area_id, name in names.items()
+        }
+
+        # 响应体在构建时一次性序列化，请求时直接返回字节串
+        self.province_payload = make_area_payload(
+            {'code': RETCODE.OK, 'errmsg': 'OK', 'province_list': self.province_list})
+        self._sub_payloads = {
+            area_id: make_area_payload({'code': RETCODE.OK, 'errmsg': 'OK', 'sub_data': sub_data})
+            for area_id, sub_data in self._sub_data.items()
+        }
+
+    def get_name(self, area_id):
+        """根据id获取行政区划名称，不存在返回None"""
+        return self._names.get(area_id)
+
+    def get_sub_data(self, area_id):
+        """根据上级id获取城市或区县数据，不存在返回None"""
+        return self._sub_data.get(area_id)
+
+    def get_sub_payload(self, area_id):
+        """根据上级id获取城市或区县的响应体，不存在返回None"""
+        return self._sub_payloads.get(area_id)
+
+
+_area_tree = None
+_checked_at = 0
+_lock = threading.Lock()
+
+
+def _get_area_version():
+    """读取redis中的省市区数据版本号"""
+    return cache.get(constants.AREA_VERSION_KEY) or 0
+
+
+def _load_area_rows():
+    """一次查询出全部省市区数据"""
+    return list(Area.objects.order_by('id').values_list('id', 'name', 'parent_id'))
+
+
+def get_area_tree():
+    """
+    获取进程内的省市区树
+    每隔AREA_VERSION_CHECK_INTERVAL秒对比一次redis中的版本号，版本号变化时重新构建
+    :return: AreaTree
+    """
+    global _area_tree, _checked_at
+
+    tree = _area_tree
+    if tree is not None and time.monotonic() - _checked_at < constants.AREA_VERSION_CHECK_INTERVAL:
+        return tree
+
+    with _lock:
+        tree = _area_tree
+        if tree is not None and time.monotonic() - _checked_at < constants.AREA_VERSION_CHECK_INTERVAL:
+            return tree
+
+        try:
+            version = _get_area_version()
+        except Exception as e:
+            # redis不可用时继续使用已有的省市区树
+            logger.error(e)
+            if tree is None:
+                raise
+            version = tree.version
+
+        if tree is None or tree.version != version:
+            # 省市区数据缓存在redis中，多个进程同时重建时只有一个去查询mysql
+            rows = get_or_set('area_rows_%s' % version, _load_area_rows, constants.AREA_ROWS_CACHE_EXPIRES)
+            tree = AreaTree(version, rows)
+            _area_tree = tree
+
+        _checked_at = time.monotonic()
+        return tree
+
+
+def expire_area_tree():
+    """省市区数据变化后递增版本号，所有进程在下次检查时重新构建省市区树"""
+    global _checked_at
+
+    try:
+        cache.incr(constants.AREA_VERSION_KEY)
+    except ValueError:
+        cache.set(constants.AREA_VERSION_KEY, 1, None)
+    _checked_at = 0
@@ -2,55 +2,47 @@ from django.shortcuts import render
 import logging
 from django.views import View
 from django import http
-from django.core.cache import cache
+from django.utils.http import parse_etags
 
-from areas.models import Area
+from areas.utils import get_area_tree
 from meiduo_mall.utils.response_code import RETCODE
 # Create your views here.
 
 logger = logging.getLogger('django')
 
 
+def area_response(request, payload):
+    """返回提前序列化好的省市区数据，ETag匹配时响应304"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or payload.etag in parse_etags(if_none_match)):
+        response = http.HttpResponseNotModified()
+    else:
+        response = http.HttpResponse(payload.body, content_type='application/json')
+        response['Content-Length'] = len(payload.body)
+    response['ETag'] = payload.etag
+    return response
+
+
 class AreasView(View):
     """省市区三级联动"""
     def get(self, request):
         area_id = request.GET.get('area_id')
 
+        # 获取进程内的省市区树，无需访问redis和mysql
+        try:
+            area_tree = get_area_tree()
+        except Exception as e:
+            logger.error(e)
+            return http.JsonResponse({'code': RETCODE.DBERR, 'errmsg': '省市区数据错误'})
+
         if not area_id:
-            # 获取并判断是否有缓存数据
-            province_list = cache.get('province_list')
-            if not province_list:
-                try:
-                    province_model_list = Area.objects.filter(parent__isnull=True)
-                    province_list = []
-                    for province_model in province_model_list:
-                        province_list.append({'id': province_model.id, 'name': province_model.name})
-                    # 缓存省份字典列表数据: 默认存储到别名为default的redis库中
-                    cache.set('province_list', province_list, 3600)
-                except Exception as e:
-                    logger.error(e)
-                    return http.JsonResponse({'code': RETCODE.DBERR, 'errmsg': '省份数据错误'})
-            return http.JsonResponse({'code': RETCODE.OK, 'errmsg': 'OK', 'province_list': province_list})
+            return area_response(request, area_tree.province_payload)
         else:
-            # 判断是否有缓存
-            sub_data = cache.get('sub_area_' + area_id)
-            if not sub_data:
-                try:
-                    parent_model = Area.objects.get(id=area_id)
-                    sub_model_list = parent_model.subs.all()
-
-                    sub_list = []
-                    for sub_model in sub_model_list:
-                        sub_list.append({'id': sub_model.id, 'name': sub_model.name})
-                    sub_data = {
-                        'id': parent_model.id,
-                        'name': parent_model.name,
-                        'subs': sub_list,
-                    }
-                    # 缓存城市或者区县
-                    cache.set('sub_area_' + area_id, sub_data, 3600)
-                except Exception as e:
-                    logger.error(e)
-                    return http.JsonResponse({'code': RETCODE.DBERR, 'errmsg': '城市或区数据错误'})
+            try:
+                payload = area_tree.get_sub_payload(int(area_id))
+            except ValueError:
+                payload = None
+            if payload is None:
+                return http.JsonResponse({'code': RETCODE.DBERR, 'errmsg': '城市或区数据错误'})
             # 相应城市或市县JSON数据
-            return http.JsonResponse({'code': RETCODE.OK, 'errmsg': 'OK', 'sub_data': sub_data})
+            return area_response(request, payload)
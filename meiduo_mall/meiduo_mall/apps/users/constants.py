@@ -3,3 +3,16 @@ VERIFY_EMAIL_TOKEN_EXPIRES = 60 * 60 * 24
 
 # 用户地址上限
 USER_ADDRESS_COUNTS_LIMIT = 10
+
+# 不存在账号的缓存时间，单位：秒
+UNKNOWN_ACCOUNT_CACHE_EXPIRES = 300
+
+# 用户名、手机号布隆过滤器的容量和误判率，修改后需要执行 python manage.py rebuild_user_bloom
+USER_BLOOM_CAPACITY = 1000000
+USER_BLOOM_ERROR_RATE = 0.001
+
+# 登录限流：{维度: (窗口内次数上限, 窗口长度秒数)}
+LOGIN_RATE_LIMITS = {'ip': (60, 60), 'account': (10, 300)}
+
+# 注册限流：{维度: (窗口内次数上限, 窗口长度秒数)}
+REGISTER_RATE_LIMITS = {'ip': (20, 3600), 'account': (5, 3600)}
@@ -0,0 +1,43 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, get_hashers, make_password
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    密码哈希基准：按PASSWORD_HASHERS中的每个哈希器测量单核每秒可完成的登录校验数
+    python manage.py bench_password_hashers
+    python manage.py bench_password_hashers --seconds 5 --threads 4
+    """
+    help = '测量每个密码哈希器每核每秒的登录校验数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2, help='每个哈希器的测量时长，单位：秒')
+        parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help='并发测量的线程数')
+
+    def handle(self, *args, **options):
+        for hasher in get_hashers():
+            encoded = make_password('meiduo123456', hasher=hasher.algorithm)
+            single = self._measure(encoded, options['seconds'], 1)
+            parallel = self._measure(encoded, options['seconds'], options['threads'])
+            self.stdout.write('%s: %.1f 次/秒/核，%d线程 %.1f 次/秒' % (
+                type(hasher).__name__, single, options['threads'], parallel))
+
+    @staticmethod
+    def _measure(encoded, seconds, threads):
+        deadline = time.monotonic() + seconds
+
+        def run():
+            count = 0
+            while time.monotonic() < deadline:
+                check_password('meiduo123456', encoded)
+                count += 1
+            return count
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            total = sum(executor.map(lambda _: run(), range(threads)))
+        return total / (time.monotonic() - start)
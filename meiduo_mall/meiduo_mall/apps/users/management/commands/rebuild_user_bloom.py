@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from users.models import User
+from users.utils import get_user_bloom
+
+
+class Command(BaseCommand):
+    """
+    从tb_user重建用户名、手机号布隆过滤器
+    python manage.py rebuild_user_bloom
+    python manage.py rebuild_user_bloom --batch-size 5000
+    """
+    help = '重建用户名、手机号布隆过滤器'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批读取的用户数')
+
+    def handle(self, *args, **options):
+        for field in ('username', 'mobile'):
+            bloom = get_user_bloom(field)
+            last_id = [0]
+            count = bloom.rebuild(self._batches(field, options['batch_size'], last_id))
+            # 替换过滤器期间注册的用户补充进去
+            for values in self._batches(field, options['batch_size'], last_id):
+                bloom.add(*values)
+                count += len(values)
+            self.stdout.write('%s: %d条，%d位，%d次哈希' % (field, count, bloom.size, bloom.hash_count))
+
+    @staticmethod
+    def _batches(field, batch_size, last_id):
+        """按主键顺序流式读取，直到没有新数据；last_id[0]记录读到的最大主键"""
+        while True:
+            rows = list(User.objects.filter(id__gt=last_id[0]).order_by('id').values_list('id', field)[:batch_size])
+            if not rows:
+                break
+            last_id[0] = rows[-1][0]
+            yield [value for _, value in rows]
@@ -1,3 +1,190 @@
-from django.test import TestCase
+import threading
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+
+from django.contrib.auth.hashers import Argon2PasswordHasher
+from django.core import signing
+from django.test import SimpleTestCase, TestCase, override_settings
+from django_redis import get_redis_connection
+
+from areas.models import Area
+from areas.utils import get_area_tree, expire_area_tree
+from celery_tasks.main import celery_app
+from meiduo_mall.utils import auth_context, hashers
+from meiduo_mall.utils.auth_context import AUTH_CONTEXT_COOKIE, AUTH_CONTEXT_SALT, clear_user_contacts
+from meiduo_mall.utils.response_code import RETCODE
+from users import views
+from users.models import User, Address
+from users.utils import get_user_bloom
 
 # Create your tests here.
+
+
+class AddressViewTest(TestCase):
+    """收货地址列表"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='zhangsan', password='12345678', mobile='13800000001')
+        province = Area.objects.create(name='广东省')
+        city = Area.objects.create(name='广州市', parent=province)
+        district = Area.objects.create(name='天河区', parent=city)
+        for i in range(5):
+            Address.objects.create(user=self.user, title='地址%d' % i, receiver='张三', province=province,
+                                   city=city, district=district, place='天河路%d号' % i, mobile='13800000001')
+        expire_area_tree()
+        get_area_tree()
+        self.client.force_login(self.user)
+
+    def test_address_list_queries(self):
+        # 查询用户、查询地址列表，省市区名称不再逐条查询外键
+        with self.assertNumQueries(2):
+            response = self.client.get('/addresses/')
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        for name in ('广东省', '广州市', '天河区', '天河路4号'):
+            self.assertIn(name, content)
+
+
+@mock.patch.object(views.login_limiter, 'allow', return_value=False)
+@mock.patch.object(views.register_limiter, 'allow', return_value=False)
+class ThrottleTest(TestCase):
+    """登录、注册限流"""
+
+    login_data = {'username': 'zhangsan', 'password': '12345678'}
+    register_data = {'username': 'zhangsan', 'password': '12345678', 'password2': '12345678',
+                     'mobile': '13800000001', 'sms_code': '123456', 'allow': 'on'}
+
+    def test_login_page(self, *mocks):
+        response = self.client.post('/login/', self.login_data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('登录过于频繁', response.content.decode())
+
+    def test_register_page(self, *mocks):
+        response = self.client.post('/register/', self.register_data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('注册过于频繁', response.content.decode())
+
+    def test_ajax(self, *mocks):
+        for url, data in (('/login/', self.login_data), ('/register/', self.register_data)):
+            response = self.client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(response.json()['code'], RETCODE.THROTTLINGERR)
+
+
+class UserInfoViewTest(TestCase):
+    """用户中心：身份cookie"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='zhangsan', password='12345678', mobile='13800000001',
+                                             email='zhangsan@example.com')
+        self.client.force_login(self.user)
+        clear_user_contacts()
+
+    def test_cookie_without_personal_data(self):
+        response = self.client.get('/info/')
+        value = signing.loads(response.cookies[AUTH_CONTEXT_COOKIE].value, salt=AUTH_CONTEXT_SALT)
+        self.assertEqual(value[:3], [self.user.id, 'zhangsan', False])
+        self.assertNotIn('13800000001', value)
+        self.assertNotIn('zhangsan@example.com', value)
+
+    def test_contact_from_process_cache(self):
+        self.client.get('/info/')
+        # 身份cookie有效：不读取session，手机号和邮箱来自进程内缓存
+        with self.assertNumQueries(0):
+            response = self.client.get('/info/')
+        content = response.content.decode()
+        self.assertIn('13800000001', content)
+        self.assertIn('zhangsan@example.com', content)
+
+        # 缓存未命中时只查询手机号和邮箱
+        clear_user_contacts()
+        with self.assertNumQueries(1):
+            response = self.client.get('/info/')
+        self.assertIn('13800000001', response.content.decode())
+
+    def test_contact_changed_in_other_process(self):
+        self.client.get('/info/')
+        # 另一个worker进程中缓存的旧邮箱
+        other_process_entry = auth_context._contacts[self.user.id]
+        with mock.patch.object(celery_app, 'send_task'):
+            response = self.client.put('/emails/', '{"email": "lisi@example.com"}', content_type='application/json')
+        self.assertEqual(response.json()['code'], RETCODE.OK)
+
+        # 修改邮箱的请求由当前进程处理，之后的请求落到另一个进程
+        auth_context._contacts[self.user.id] = other_process_entry
+        with self.assertNumQueries(1):
+            response = self.client.get('/info/')
+        content = response.content.decode()
+        self.assertIn('lisi@example.com', content)
+        self.assertNotIn('zhangsan@example.com', content)
+
+
+class UserBloomTest(TestCase):
+    """用户名、手机号布隆过滤器"""
+
+    def setUp(self):
+        User.objects.create_user(username='existinguser', password='12345678', mobile='13800000001')
+        get_redis_connection('default').delete('user_username_bloom', 'user_mobile_bloom')
+        get_redis_connection('verify_code').setex('sms_13800000002', 300, '123456')
+
+    def register(self):
+        return self.client.post('/register/', {'username': 'newuser', 'password': '12345678',
+                                               'password2': '12345678', 'mobile': '13800000002',
+                                               'sms_code': '123456', 'allow': 'on'})
+
+    def test_register_before_build(self):
+        # 过滤器未建立时注册，不能只写入新用户的位图
+        self.assertEqual(self.register().status_code, 302)
+        self.assertIsNone(get_user_bloom('username').contains('existinguser'))
+        self.assertEqual(self.client.get('/usernames/existinguser/count/').json()['count'], 1)
+        self.assertEqual(self.client.get('/mobiles/13800000001/count/').json()['count'], 1)
+
+    def test_register_after_build(self):
+        for field in ('username', 'mobile'):
+            get_user_bloom(field).rebuild([User.objects.values_list(field, flat=True)])
+        self.register()
+        self.assertTrue(get_user_bloom('username').contains('newuser'))
+        self.assertTrue(get_user_bloom('username').contains('existinguser'))
+        self.assertIs(get_user_bloom('username').contains('nobody'), False)
+
+
+@override_settings(PASSWORD_VERIFY_TIMEOUT=0.01)
+class PasswordVerifyBusyTest(TestCase):
+    """密码校验槽位已满"""
+
+    def setUp(self):
+        User.objects.create_user(username='zhangsan', password='12345678', mobile='13800000001')
+
+    @mock.patch.object(views.login_limiter, 'allow', return_value=True)
+    def test_login_not_queued(self, allow):
+        semaphore = threading.BoundedSemaphore(1)
+        semaphore.acquire()
+        with mock.patch.object(hashers, '_verify_semaphore', semaphore):
+            response = self.client.post('/login/', {'username': 'zhangsan', 'password': '12345678'})
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('登录人数过多', response.content.decode())
+            response = self.client.post('/login/', {'username': 'zhangsan', 'password': '12345678'},
+                                        HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            self.assertEqual(response.json()['code'], RETCODE.THROTTLINGERR)
+
+
+@skipUnless(find_spec('argon2'), '需要安装argon2-cffi')
+class Argon2HasherTest(SimpleTestCase):
+    """Argon2id哈希器"""
+
+    def setUp(self):
+        self.hasher = hashers.TunedArgon2PasswordHasher()
+
+    def test_argon2id(self):
+        encoded = self.hasher.encode('12345678', self.hasher.salt())
+        self.assertTrue(encoded.startswith('argon2$argon2id$v=19$m=19456,t=2,p=1$'))
+        self.assertTrue(self.hasher.verify('12345678', encoded))
+        self.assertFalse(self.hasher.verify('87654321', encoded))
+        self.assertFalse(self.hasher.must_update(encoded))
+
+    def test_rehash_argon2i(self):
+        # Django默认哈希器生成的argon2i哈希仍能校验，并在登录成功后重新生成
+        old = Argon2PasswordHasher()
+        encoded = old.encode('12345678', old.salt())
+        self.assertTrue(encoded.startswith('argon2$argon2i$'))
+        self.assertTrue(self.hasher.verify('12345678', encoded))
+        self.assertTrue(self.hasher.must_update(encoded))
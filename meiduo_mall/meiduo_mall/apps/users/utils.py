@@ -1,13 +1,55 @@
 # 自定义用户认证的后端 实现多账号登录
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Q
+from django_redis import get_redis_connection
 import re
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from django.conf import settings
 from itsdangerous import BadData
+import logging
 
 from users.models import User
+from areas.utils import get_area_tree
+from meiduo_mall.utils.bloom import BloomFilter
+from meiduo_mall.utils.hashers import check_user_password
 from . import constants
 
+logger = logging.getLogger('django')
+
+
+def get_area_name(address, field):
+    """
+    获取地址的省市区名称：优先从进程内省市区树读取，避免逐条查询外键
+    :param address: 地址模型对象
+    :param field: 'province'、'city'或'district'
+    :return: 名称
+    """
+    try:
+        name = get_area_tree().get_name(int(getattr(address, field + '_id')))
+    except Exception as e:
+        logger.error(e)
+        name = None
+    if name is None:
+        name = getattr(address, field).name
+    return name
+
+
+def address_to_dict(address):
+    """将地址模型对象转换为响应字典"""
+    return {
+        "id": address.id,
+        "title": address.title,
+        "receiver": address.receiver,
+        "province": get_area_name(address, 'province'),
+        "city": get_area_name(address, 'city'),
+        "district": get_area_name(address, 'district'),
+        "place": address.place,
+        "mobile": address.mobile,
+        "tel": address.tel,
+        "email": address.email
+    }
+
 
 def check_verify_email_token(token):
     """反序列化token，获取user"""
@@ -36,32 +78,82 @@ def generate_verify_email_url(user):
     return verify_url
 
 
+def get_users_by_account(account):
+    """
+    根据account查询用户：一次查询同时匹配用户名和手机号，不存在的账号缓存一段时间，不再查库
+    某用户的用户名恰好是另一用户的手机号时，两者都返回，account形如手机号时手机号匹配的在前，否则用户名匹配的在前
+    :param account: 用户名或者手机号
+    :return: 用户列表，至多两个
+    """
+    key = 'unknown_account_%s' % account
+    if cache.get(key):
+        return []
+
+    users = list(User.objects.filter(Q(mobile=account) | Q(username=account))[:2])
+    if not users:
+        cache.set(key, 1, constants.UNKNOWN_ACCOUNT_CACHE_EXPIRES)
+    elif re.match(r'^1[3-9]\d{9}$', account):
+        # 手机号登录
+        users.sort(key=lambda user: user.mobile != account)
+    else:
+        # 用户名登录
+        users.sort(key=lambda user: user.username != account)
+    return users
+
+
 def get_user_by_account(account):
     """
     根据account查询用户
     :param account: 用户名或者手机号
     :return: user
     """
+    users = get_users_by_account(account)
+    return users[0] if users else None
+
+
+def expire_unknown_account(*accounts):
+    """新用户注册后，清除其用户名和手机号的不存在缓存"""
+    cache.delete_many(['unknown_account_%s' % account for account in accounts])
+
+
+def get_user_bloom(field):
+    """
+    已注册用户名或手机号的布隆过滤器
+    :param field: 'username'或'mobile'
+    """
+    return BloomFilter(get_redis_connection('default'), 'user_%s_bloom' % field,
+                       constants.USER_BLOOM_CAPACITY, constants.USER_BLOOM_ERROR_RATE)
+
+
+def is_user_field_taken(field, value):
+    """
+    判断用户名或手机号是否已被注册：布隆过滤器确定不存在时不查库，过滤器未建立或不可用时查库
+    :return: 已注册的用户数
+    """
     try:
-        if re.match('^1[3-9]\d{9}$', account):
-            # 手机号登录
-            user = User.objects.get(mobile=account)
-        else:
-            # 用户名登录
-            user = User.objects.get(username=account)
-    except User.DoesNotExist:
-        return None
-    else:
-        return user
+        maybe_taken = get_user_bloom(field).contains(value)
+    except Exception as e:
+        logger.error(e)
+        maybe_taken = None
+    if maybe_taken is False:
+        return 0
+    return User.objects.filter(**{field: value}).count()
+
+
+def add_user_to_bloom(user):
+    """注册成功后将用户名和手机号加入布隆过滤器"""
+    try:
+        get_user_bloom('username').add(user.username)
+        get_user_bloom('mobile').add(user.mobile)
+    except Exception as e:
+        logger.error(e)
 
 
 class UsernameMobileBackend(ModelBackend):
     # 自定义用户认证后端
     def authenticate(self, request, username=None, password=None, **kwargs):
-        user = get_user_by_account(username)
-
-        if user and user.check_password(password):
-            return user
-        else:
-            return None
+        for user in get_users_by_account(username):
+            if check_user_password(user, password):
+                return user
+        return None
 
@@ -4,21 +4,30 @@ from django.contrib.auth import login, authenticate, logout
 from django.db import DatabaseError
 from django.shortcuts import render, redirect
 from django.urls import reverse
+from django.utils import timezone
 from django.views import View
 from django_redis import get_redis_connection
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from users.models import User, Address
 from meiduo_mall.utils.response_code import RETCODE
-from meiduo_mall.utils.views import LoginRequiredJSONMixin
+from meiduo_mall.utils.views import LoginRequiredJSONMixin, AuthContextLoginRequiredMixin
+from meiduo_mall.utils.hashers import PasswordVerifyBusy
+from meiduo_mall.utils.auth_context import set_auth_context, delete_auth_context
+from meiduo_mall.utils.ratelimit import SlidingWindowRateLimiter, get_client_ip
 from celery_tasks.email.tasks import send_verify_email
-from users.utils import generate_verify_email_url, check_verify_email_token
+from users.utils import generate_verify_email_url, check_verify_email_token, address_to_dict, expire_unknown_account
+from users.utils import is_user_field_taken, add_user_to_bloom
 from . import constants
 # Create your views here.
 
 # 创建日志输出器
 logger = logging.getLogger('django')
 
+# 登录、注册的限流器，在查库和计算密码哈希之前检查
+login_limiter = SlidingWindowRateLimiter('login', constants.LOGIN_RATE_LIMITS)
+register_limiter = SlidingWindowRateLimiter('register', constants.REGISTER_RATE_LIMITS)
+
 
 class ChangePasswordView(LoginRequiredMixin, View):
     """修改密码"""
@@ -59,6 +68,7 @@ class ChangePasswordView(LoginRequiredMixin, View):
         logout(request)
         response = redirect(reverse('users:login'))
         response.delete_cookie('username')
+        delete_auth_context(response)
 
         # # 响应密码修改结果：重定向到登录界面
         return response
@@ -136,10 +146,9 @@ class UpdateDestroyAddressView(LoginRequiredJSONMixin, View):
             if not re.match(r'^[a-z0-9][\w\.\-]*@[a-z0-9\-]+(\.[a-z]{2,5}){1,2}$', email):
                 return http.HttpResponseForbidden('参数email有误')
 
-        # 判断地址是否存在,并更新地址信息
+        # 判断地址是否存在,并更新地址信息：只能更新当前用户未删除的地址
         try:
-            Address.objects.filter(id=address_id).update(
-                user=request.user,
+            count = Address.objects.filter(id=address_id, user=request.user, is_deleted=False).update(
                 title=receiver,
                 receiver=receiver,
                 province_id=province_id,
@@ -148,26 +157,29 @@ class UpdateDestroyAddressView(LoginRequiredJSONMixin, View):
                 place=place,
                 mobile=mobile,
                 tel=tel,
-                email=email
+                email=email,
+                update_time=timezone.now()
             )
         except Exception as e:
             logger.error(e)
             return http.JsonResponse({'code': RETCODE.DBERR, 'errmsg': '更新地址失败'})
-
-        # 构造响应数据
-        address = Address.objects.get(id=address_id)
-        address_dict = {
-            "id": address.id,
-            "title": address.title,
-            "receiver": address.receiver,
-            "province": address.province.name,
-            "city": address.city.name,
-            "district": address.district.name,
-            "place": address.place,
-            "mobile": address.mobile,
-            "tel": address.tel,
-            "email": address.email
-        }
+        if count == 0:
+            return http.JsonResponse({'code': RETCODE.NODATAERR, 'errmsg': '地址不存在'})
+
+        # 构造响应数据：直接使用校验后的参数，无需再查询地址
+        address = Address(
+            id=int(address_id),
+            title=receiver,
+            receiver=receiver,
+            province_id=province_id,
+            city_id=city_id,
+            district_id=district_id,
+            place=place,
+            mobile=mobile,
+            tel=tel,
+            email=email
+        )
+        address_dict = address_to_dict(address)
 
         # 响应更新地址结果
         return http.JsonResponse({'code': RETCODE.OK, 'errmsg': '更新地址成功', 'address': address_dict})
@@ -241,18 +253,7 @@ class AddressCreateView(LoginRequiredJSONMixin, View):
             return http.JsonResponse({'code': RETCODE.DBERR, 'errmsg': '新增地址失败'})
 
         # 新增地址成功，将新增的地址响应给前端实现局部刷新
-        address_dict = {
-            "id": address.id,
-            "title": address.title,
-            "receiver": address.receiver,
-            "province": address.province.name,
-            "city": address.city.name,
-            "district": address.district.name,
-            "place": address.place,
-            "mobile": address.mobile,
-            "tel": address.tel,
-            "email": address.email
-        }
+        address_dict = address_to_dict(address)
         return http.JsonResponse({'code': RETCODE.OK, 'errmsg': '新增地址成功', 'address': address_dict})
 
 
@@ -261,21 +262,8 @@ class AddressView(LoginRequiredMixin, View):
         login_user = request.user
         addresses = Address.objects.filter(user=login_user, is_deleted=False)
 
-        address_dict_list = []
-        for address in addresses:
-            address_dict = {
-                "id": address.id,
-                "title": address.title,
-                "receiver": address.receiver,
-                "province": address.province.name,
-                "city": address.city.name,
-                "district": address.district.name,
-                "place": address.place,
-                "mobile": address.mobile,
-                "tel": address.tel,
-                "email": address.email
-            }
-            address_dict_list.append(address_dict)
+        # 省市区名称从进程内省市区树中读取，整个列表只需一次查询
+        address_dict_list = [address_to_dict(address) for address in addresses]
         context = {
             'default_address_id': login_user.default_address_id,
             'addresses': address_dict_list,
@@ -301,7 +289,8 @@ class VerifyEmailView(View):
         except Exception as e:
             logger.error(e)
             return http.HttpResponseServerError('激活邮件失败')
-        return redirect(reverse('users:info'))
+        # 邮箱验证状态变化，身份cookie失效后重新加载
+        return delete_auth_context(redirect(reverse('users:info')))
 
 
 class EmailView(LoginRequiredJSONMixin, View):
@@ -323,16 +312,20 @@ class EmailView(LoginRequiredJSONMixin, View):
 
         verify_url = generate_verify_email_url(request.user)
         send_verify_email.delay(email, verify_url)   # 记得调用delay
-        return http.JsonResponse({'code': RETCODE.OK, 'errmsg': '添加邮箱成功'})
+        response = http.JsonResponse({'code': RETCODE.OK, 'errmsg': '添加邮箱成功'})
+        # 刷新身份cookie中的邮箱
+        return set_auth_context(response, request, request.user)
 
 
-class UserInfoView(LoginRequiredMixin, View):
+class UserInfoView(AuthContextLoginRequiredMixin, View):
     def get(self, request):
+        # 身份cookie有效时不读取session；手机号和邮箱不在cookie中，由进程内缓存提供
+        user = getattr(request, 'auth_context', None) or request.user
         context = {
-            'username': request.user.username,
-            'mobile': request.user.mobile,
-            'email': request.user.email,
-            'email_active': request.user.email_active
+            'username': user.username,
+            'mobile': user.mobile,
+            'email': user.email,
+            'email_active': user.email_active
         }
         return render(request, 'user_center_info.html', context=context)
 
@@ -343,6 +336,7 @@ class LogoutView(View):
         logout(request)
         response = redirect(reverse('contents:index'))
         response.delete_cookie('username')
+        delete_auth_context(response)
         return response
 
 
@@ -350,6 +344,13 @@ class LoginView(View):
     def get(self, request):
         return render(request, 'login.html')
 
+    @staticmethod
+    def throttled(request, errmsg):
+        """表单提交返回页面并提示错误，ajax请求仍然返回错误码"""
+        if request.is_ajax():
+            return http.JsonResponse({'code': RETCODE.THROTTLINGERR, 'errmsg': errmsg})
+        return render(request, 'login.html', {'account_errmsg': '%s，请稍后再试' % errmsg}, status=429)
+
     def post(self, request):
         username = request.POST.get('username')
         password = request.POST.get('password')
@@ -364,7 +365,14 @@ class LoginView(View):
         if not re.match(r'^[0-9A-Za-z]{8,20}$', password):
             return http.HttpResponseForbidden('密码最少8位，最长20位')
 
-        user = authenticate(username=username, password=password)
+        if not login_limiter.allow(ip=get_client_ip(request), account=username):
+            return self.throttled(request, '登录过于频繁')
+
+        try:
+            user = authenticate(username=username, password=password)
+        except PasswordVerifyBusy:
+            # 同时校验密码的请求过多，不排队等待
+            return self.throttled(request, '登录人数过多')
         if user is None:
             return render(request, 'login.html', {'account_errmsg': '用户名或密码错误'})
 
@@ -387,19 +395,20 @@ class LoginView(View):
 
         # 为了实现在首页的右上角展示用户名信息，我们需要将用户名缓存到cookie中
         response.set_cookie('username', user.username, max_age=3600 * 24 * 15)
+        set_auth_context(response, request, user)
         return response
 
 
 class UsernameCountView(View):
     # 判断用户名是否重复注册
     def get(self, request, username):
-        count = User.objects.filter(username=username).count()
+        count = is_user_field_taken('username', username)
         return http.JsonResponse({'code': RETCODE.OK, 'errmsg': 'OK', 'count': count})
 
 
 class MobileCountView(View):
     def get(self, request, mobile):
-        count = User.objects.filter(mobile=mobile).count()
+        count = is_user_field_taken('mobile', mobile)
         return http.JsonResponse({'code': RETCODE.OK, 'errmsg': 'OK', 'count': count})
 
 
@@ -437,6 +446,13 @@ class RegisterView(View):
         # 判断手机号是否合法
         if not re.match(r'^1[3-9]\d{9}$', mobile):
             return http.HttpResponseForbidden('请输入正确的手机号码')
+
+        if not register_limiter.allow(ip=get_client_ip(request), account=username):
+            # 表单提交返回页面并提示错误，ajax请求仍然返回错误码
+            if request.is_ajax():
+                return http.JsonResponse({'code': RETCODE.THROTTLINGERR, 'errmsg': '注册过于频繁'})
+            return render(request, 'register.html', {'register_errmsg': '注册过于频繁，请稍后再试'}, status=429)
+
         redis_conn = get_redis_connection('verify_code')
         sms_code_server = redis_conn.get('sms_%s' % mobile)
         if sms_code_server is None:
@@ -452,6 +468,8 @@ class RegisterView(View):
             user = User.objects.create_user(username=username, password=password, mobile=mobile)
         except DatabaseError:
             return render(request, 'register.html', {'register_errmsg': '注册失败'})
+        expire_unknown_account(username, mobile)
+        add_user_to_bloom(user)
 
         # 实现状态保持
         login(request, user)
@@ -460,4 +478,5 @@ class RegisterView(View):
         response = redirect(reverse('contents:index'))
         # 为了实现在首页的右上角展示用户名信息，我们需要将用户名缓存到cookie中
         response.set_cookie('username', user.username, max_age=3600 * 24 * 15)
+        set_auth_context(response, request, user)
         return response
@@ -8,4 +8,10 @@ SMS_CODE_REDIS_EXPIRES = 300
 SEND_SMS_TEMPLATE_ID = 1
 
 # 60s内是否重复发送的标记
-SEND_SMS_CODE_INTERVAL = 60
\ No newline at end of file
+SEND_SMS_CODE_INTERVAL = 60
+
+# 预生成图形验证码池的容量
+CAPTCHA_POOL_SIZE = 1000
+
+# 验证码池补充检查间隔，单位：秒
+CAPTCHA_POOL_REFILL_INTERVAL = 1
@@ -6,6 +6,9 @@
 import random
 import string
 import os.path
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 
 from PIL import Image
@@ -13,6 +16,24 @@ from PIL import ImageFilter
 from PIL.ImageDraw import Draw
 from PIL.ImageFont import truetype
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 验证码生成结果：文字、图片字节串、图片的Content-Type
+CaptchaImage = namedtuple('CaptchaImage', ['text', 'image', 'content_type'])
+
+# 支持的输出格式
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+# 字符蒙版的灰度查找表，等价于point(lambda i: i * 1.97)，但不必每次调用256次Python函数
+MASK_LUT = [min(255, int(round(i * 1.97))) for i in range(256)]
+
 
 class Bezier:
     def __init__(self):
@@ -53,12 +74,38 @@ class Bezier:
             self.beziers[n] = result
             return result
 
+    def make_bezier_matrix(self, n):
+        """ Bezier coefficients as a numpy matrix, (len(tsequence), n)
+        """
+        key = ('matrix', n)
+        try:
+            return self.beziers[key]
+        except KeyError:
+            matrix = np.array(self.make_bezier(n))
+            self.beziers[key] = matrix
+            return matrix
+
 
 class Captcha(object):
+    # 是否使用numpy向量化的曲线和噪点绘制；基准测试中没有稳定的提升，默认使用纯PIL实现
+    use_numpy = False
+    # 是否使用预先光栅化的字符蒙版；关闭时每次加载字体并渲染字符，只用于基准对比
+    use_glyph_cache = True
+    # 验证码字符集
+    CHARACTERS = string.ascii_uppercase + '3456789'
+    FONT_SIZES = (65, 70, 75)
+
     def __init__(self):
         self._bezier = Bezier()
         self._dir = os.path.dirname(__file__)
         # self._captcha_path = os.path.join(self._dir, '..', 'static', 'captcha')
+        self._default_fonts = [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
+        # 已加载的字体 {(name, size): FreeTypeFont}
+        self._fonts = {}
+        # 预先光栅化的字符蒙版 {(name, size, char): Image}
+        self._glyphs = {}
+        self._cache_lock = threading.Lock()
+        self.preload()
 
     @staticmethod
     def instance():
@@ -68,9 +115,8 @@ class Captcha(object):
 
     def initialize(self, width=200, height=75, color=None, text=None, fonts=None):
         # self.image = Image.new('RGB', (width, height), (255, 255, 255))
-        self._text = text if text else random.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
-        self.fonts = fonts if fonts else \
-            [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
+        self._text = text if text else random.sample(string.ascii_uppercase + self.CHARACTERS, 4)
+        self.fonts = fonts if fonts else self._default_fonts
         self.width = width
         self.height = height
         self._color = color if color else self.random_color(0, 200, random.randint(220, 255))
@@ -84,6 +130,48 @@ class Captcha(object):
             return red, green, blue
         return red, green, blue, opacity
 
+    # font and glyph cache
+
+    def preload(self, fonts=None, font_sizes=None, characters=None):
+        """启动时加载字体并光栅化字符集，请求时只需对缓存的字符蒙版做随机变换"""
+        for name in fonts or self._default_fonts:
+            for size in font_sizes or self.FONT_SIZES:
+                for c in characters or self.CHARACTERS:
+                    self.get_glyph(name, size, c)
+
+    def get_font(self, name, size):
+        """同一字体同一字号只加载一次"""
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            with self._cache_lock:
+                font = self._fonts.get(key)
+                if font is None:
+                    font = truetype(name, size)
+                    self._fonts[key] = font
+        return font
+
+    def get_glyph(self, name, size, c):
+        """返回裁剪好的字符灰度蒙版，同一字体同一字号的字符只渲染一次"""
+        key = (name, size, c)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font = self.get_font(name, size)
+            with self._cache_lock:
+                glyph = self._glyphs.get(key)
+                if glyph is None:
+                    glyph = self.render_glyph(font, c)
+                    self._glyphs[key] = glyph
+        return glyph
+
+    @staticmethod
+    def render_glyph(font, c):
+        """渲染裁剪好的字符灰度蒙版"""
+        c_width, c_height = font.getsize(c)
+        glyph = Image.new('L', (c_width, c_height), 0)
+        Draw(glyph).text((0, 0), c, font=font, fill=255)
+        return glyph.crop(glyph.getbbox())
+
     # draw image
 
     def background(self, image):
@@ -99,11 +187,15 @@ class Captcha(object):
         dx /= number
         path = [(dx * i, random.randint(0, height))
                 for i in range(1, number)]
-        bcoefs = self._bezier.make_bezier(number - 1)
-        points = []
-        for coefs in bcoefs:
-            points.append(tuple(sum([coef * p for coef, p in zip(coefs, ps)])
-                                for ps in zip(*path)))
+        if self.use_numpy:
+            # 贝塞尔曲线上的点 = 系数矩阵 x 控制点矩阵
+            points = self._bezier.make_bezier_matrix(number - 1).dot(np.array(path)).ravel().tolist()
+        else:
+            bcoefs = self._bezier.make_bezier(number - 1)
+            points = []
+            for coefs in bcoefs:
+                points.append(tuple(sum([coef * p for coef, p in zip(coefs, ps)])
+                                    for ps in zip(*path)))
         Draw(image).line(points, fill=color if color else self._color, width=width)
         return image
 
@@ -113,27 +205,50 @@ class Captcha(object):
         width -= dx
         dy = height / 10
         height -= dy
+        color = color if color else self._color
+        if self.use_numpy:
+            return self._noise_numpy(image, number, level, color, (dx, width), (dy, height))
         draw = Draw(image)
         for i in range(number):
             x = int(random.uniform(dx, width))
             y = int(random.uniform(dy, height))
-            draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
+            draw.line(((x, y), (x + level, y)), fill=color, width=level)
         return image
 
-    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
+    @staticmethod
+    def _noise_numpy(image, number, level, color, x_range, y_range):
+        """一次数组运算画出全部噪点，像素范围与draw.line(width=level)画出的短横线一致"""
+        pixels = np.array(image)
+        xs = np.random.uniform(x_range[0], x_range[1], number).astype(int)
+        ys = np.random.uniform(y_range[0], y_range[1], number).astype(int)
+        top = -((level - 1) // 2)
+        rows = ys[:, None, None] + np.arange(top, top + level)[None, :, None]
+        cols = xs[:, None, None] + np.arange(level + 1)[None, None, :]
+        rows, cols = np.broadcast_arrays(rows, cols)
+        height, width = pixels.shape[:2]
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        pixels[rows[inside], cols[inside]] = color[:3]
+        return Image.fromarray(pixels)
+
+    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None, chars=None):
         color = color if color else self._color
-        fonts = tuple([truetype(name, size)
-                       for name in fonts
-                       for size in font_sizes or (65, 70, 75)])
-        draw = Draw(image)
+        chars = chars if chars else self._text
+        font_keys = tuple([(name, size)
+                           for name in fonts
+                           for size in font_sizes or self.FONT_SIZES])
+        if not self.use_glyph_cache:
+            # 优化前的做法：每次生成都重新加载全部字体
+            loaded_fonts = {key: truetype(*key) for key in font_keys}
         char_images = []
-        for c in self._text:
-            font = random.choice(fonts)
-            c_width, c_height = draw.textsize(c, font=font)
-            char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
-            char_draw = Draw(char_image)
-            char_draw.text((0, 0), c, font=font, fill=color)
-            char_image = char_image.crop(char_image.getbbox())
+        for c in chars:
+            name, size = random.choice(font_keys)
+            if self.use_glyph_cache:
+                # 用缓存的字符蒙版上色，代替每次重新加载字体和渲染字符
+                glyph = self.get_glyph(name, size, c)
+            else:
+                glyph = self.render_glyph(loaded_fonts[(name, size)], c)
+            char_image = Image.new('RGB', glyph.size, (0, 0, 0))
+            char_image.paste(color[:3], None, glyph)
             for drawing in drawings:
                 d = getattr(self, drawing)
                 char_image = d(char_image)
@@ -144,7 +259,7 @@ class Captcha(object):
                       char_images[-1].size[0]) / 2)
         for char_image in char_images:
             c_width, c_height = char_image.size
-            mask = char_image.convert('L').point(lambda i: i * 1.97)
+            mask = char_image.convert('L').point(MASK_LUT)
             image.paste(char_image,
                         (offset, int((height - c_height) / 2)),
                         mask)
@@ -210,11 +325,89 @@ class Captcha(object):
         image.save(out, format=fmt)
         return text, out.getvalue()
 
+    def render(self, text=None, color=None, width=200, height=75, fonts=None, fmt='JPEG', quality=75):
+        """
+        可重入的验证码生成：每次请求的状态只保存在局部变量中，多线程共用一个实例也是安全的
+        :param text: 验证码文字，默认随机4个字符
+        :param color: 文字颜色，默认随机
+        :param fmt: 输出格式，JPEG / PNG / WEBP
+        :param quality: JPEG、WEBP的压缩质量，PNG忽略
+        :return: CaptchaImage
+        """
+        fmt = fmt.upper()
+        chars = text if text else random.sample(string.ascii_uppercase + self.CHARACTERS, 4)
+        color = color if color else self.random_color(0, 200, random.randint(220, 255))
+        image = Image.new('RGB', (width, height), (255, 255, 255))
+        image = self.background(image)
+        image = self.text(image, fonts or self._default_fonts, drawings=['warp', 'rotate', 'offset'],
+                          color=color, chars=chars)
+        image = self.curve(image, color=color)
+        image = self.noise(image, color=color)
+        image = self.smooth(image)
+        out = BytesIO()
+        if fmt == 'PNG':
+            image.save(out, format=fmt)
+        else:
+            image.save(out, format=fmt, quality=quality)
+        return CaptchaImage("".join(chars), out.getvalue(), CONTENT_TYPES[fmt])
+
     def generate_captcha(self):
-        self.initialize()
-        return self.captcha("")
+        result = self.render()
+        return result.text, result.image
 
 captcha = Captcha.instance()
 
+
+def _seed_worker():
+    """子进程继承了父进程的随机数状态，需要重新播种，否则各进程会生成相同的验证码"""
+    random.seed()
+    if np is not None:
+        np.random.seed()
+
+
+def _render_batch(count, fmt, quality):
+    return [captcha.render(fmt=fmt, quality=quality) for _ in range(count)]
+
+
+def generate_batch(count, fmt='JPEG', quality=75, workers=None, chunk_size=100):
+    """
+    多进程批量生成验证码，充分利用所有CPU核
+    :param count: 生成数量
+    :param fmt: 输出格式，JPEG / PNG / WEBP
+    :param quality: JPEG、WEBP的压缩质量
+    :param workers: 进程数，默认为CPU核数
+    :param chunk_size: 每个任务生成的数量
+    :return: 生成器，每次产出一个CaptchaImage列表
+    """
+    sizes = [min(chunk_size, count - i) for i in range(0, count, chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_seed_worker) as executor:
+        for batch in executor.map(_render_batch, sizes, [fmt] * len(sizes), [quality] * len(sizes)):
+            yield batch
+
 if __name__ == '__main__':
-    print(captcha.generate_captcha())
+    import sys
+    import timeit
+
+    if sys.argv[1:2] == ['bench']:
+        # 微基准：python captcha.py bench [次数]
+        # 对比优化前（每次加载字体、渲染字符）与字符蒙版缓存、numpy绘制
+        number = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        variants = [('uncached', False, False), ('glyph cache', True, False)]
+        if np is not None:
+            variants.append(('glyph cache + numpy', True, True))
+        for label, use_glyph_cache, use_numpy in variants:
+            captcha.use_glyph_cache = use_glyph_cache
+            captcha.use_numpy = use_numpy
+            seconds = timeit.timeit(captcha.generate_captcha, number=number)
+            print('%s: %d captchas in %.3fs, %.1f captchas/s' % (label, number, seconds, number / seconds))
+    elif sys.argv[1:2] == ['batch']:
+        # 多进程批量生成：python captcha.py batch [次数] [格式]
+        number = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        fmt = sys.argv[3] if len(sys.argv) > 3 else 'JPEG'
+        start = timeit.default_timer()
+        size = sum(len(result.image) for batch in generate_batch(number, fmt=fmt) for result in batch)
+        seconds = timeit.default_timer() - start
+        print('%s: %d captchas in %.3fs, %.1f captchas/s, %.0f bytes/captcha' % (
+            fmt, number, seconds, number / seconds, size / number))
+    else:
+        print(captcha.generate_captcha())
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from verifications import constants
+from verifications.utils import fill_captcha_pool, get_captcha_pool_stats
+
+
+class Command(BaseCommand):
+    """
+    补充预生成图形验证码池
+    python manage.py fill_captcha_pool          # 补充一次
+    python manage.py fill_captcha_pool --loop   # 常驻进程，持续补充
+    python manage.py fill_captcha_pool --stats  # 查看验证码池监控数据
+    """
+    help = '补充预生成图形验证码池'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=constants.CAPTCHA_POOL_SIZE, help='验证码池容量')
+        parser.add_argument('--loop', action='store_true', help='持续补充验证码池')
+        parser.add_argument('--interval', type=float, default=constants.CAPTCHA_POOL_REFILL_INTERVAL, help='补充检查间隔，单位：秒')
+        parser.add_argument('--workers', type=int, default=None, help='生成验证码的进程数')
+        parser.add_argument('--stats', action='store_true', help='输出验证码池监控数据')
+
+    def handle(self, *args, **options):
+        redis_conn = get_redis_connection('verify_code')
+
+        if options['stats']:
+            for key, value in get_captcha_pool_stats(redis_conn).items():
+                self.stdout.write('%s: %s' % (key, value))
+            return
+
+        while True:
+            count = fill_captcha_pool(redis_conn, options['size'], options['workers'])
+            if count:
+                stats = get_captcha_pool_stats(redis_conn)
+                self.stdout.write('补充%d张，当前%d张，%.1f张/秒' % (count, stats['depth'], stats['refill_rate']))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,143 @@
+import time
+
+from verifications.libs.captcha.captcha import captcha, generate_batch
+from . import constants
+
+# 验证码池及其统计数据在redis中的key
+CAPTCHA_POOL_KEY = 'captcha_pool'
+CAPTCHA_POOL_STATS_KEY = 'captcha_pool_stats'
+# 每次写入验证码池的数量
+CAPTCHA_POOL_PUSH_BATCH = 100
+
+
+def pop_captcha(redis_conn):
+    """
+    从验证码池中原子地取出一张预先生成的图形验证码
+    :param redis_conn: verify_code库的redis连接
+    :return: (text, image)，验证码池为空时返回None
+    """
+    pl = redis_conn.pipeline()
+    pl.lpop(CAPTCHA_POOL_KEY)
+    pl.hincrby(CAPTCHA_POOL_STATS_KEY, 'requests', 1)
+    entry, _ = pl.execute()
+    if entry is None:
+        redis_conn.hincrby(CAPTCHA_POOL_STATS_KEY, 'misses', 1)
+        return None
+    text, image = entry.split(b':', 1)
+    return text.decode(), image
+
+
+def _generate_captchas(count, workers=None):
+    """按批生成验证码，workers大于1时使用多进程"""
+    if workers and workers > 1:
+        for batch in generate_batch(count, workers=workers, chunk_size=CAPTCHA_POOL_PUSH_BATCH):
+            yield [(result.text, result.image) for result in batch]
+        return
+
+    for start in range(0, count, CAPTCHA_POOL_PUSH_BATCH):
+        yield [captcha.generate_captcha() for _ in range(min(CAPTCHA_POOL_PUSH_BATCH, count - start))]
+
+
+def fill_captcha_pool(redis_conn, size=constants.CAPTCHA_POOL_SIZE, workers=None):
+    """
+    补充验证码池至size张
+    :param redis_conn: verify_code库的redis连接
+    :param size: 验证码池容量
+    :param workers: 生成验证码的进程数，默认在当前进程中生成
+    :return: 本次补充的数量
+    """
+    count = size - redis_conn.llen(CAPTCHA_POOL_KEY)
+    if count <= 0:
+        return 0
+
+    start = time.time()
+    produced = 0
+    # 分批写入，池快空时消费者能尽早取到新的验证码
+    for batch in _generate_captchas(count, workers):
+        entries = [text.encode() + b':' + image for text, image in batch]
+        produced += len(entries)
+
+        pl = redis_conn.pipeline()
+        pl.rpush(CAPTCHA_POOL_KEY, *entries)
+        # 多个补充进程同时运行时，保证不超过容量
+        pl.ltrim(CAPTCHA_POOL_KEY, 0, size - 1)
+        pl.hincrby(CAPTCHA_POOL_STATS_KEY, 'produced', len(entries))
+        pl.execute()
+
+    seconds = time.time() - start
+    pl = redis_conn.pipeline()
+    pl.hset(CAPTCHA_POOL_STATS_KEY, 'refill_rate', '%.1f' % (produced / seconds if seconds else 0))
+    pl.hset(CAPTCHA_POOL_STATS_KEY, 'refilled_at', int(time.time()))
+    pl.execute()
+    return produced
+
+
+def get_captcha_pool_stats(redis_conn):
+    """
+    验证码池监控数据
+    :return: {'depth': 当前数量, 'produced': 累计生成, 'requests': 累计请求, 'misses': 池为空的次数,
+              'refill_rate': 最近一次补充的速度(张/秒), 'refilled_at': 最近一次补充的时间戳}
+    """
+    pl = redis_conn.pipeline()
+    pl.llen(CAPTCHA_POOL_KEY)
+    pl.hgetall(CAPTCHA_POOL_STATS_KEY)
+    depth, stats = pl.execute()
+
+    stats = {key.decode(): value.decode() for key, value in stats.items()}
+    return {
+        'depth': depth,
+        'produced': int(stats.get('produced', 0)),
+        'requests': int(stats.get('requests', 0)),
+        'misses': int(stats.get('misses', 0)),
+        'refill_rate': float(stats.get('refill_rate', 0)),
+        'refilled_at': int(stats.get('refilled_at', 0)),
+    }
+
+
+# 短信发送校验结果
+SMS_GATE_OK = 0
+SMS_GATE_THROTTLED = 1
+SMS_GATE_IMAGE_CODE_EXPIRED = 2
+SMS_GATE_IMAGE_CODE_ERROR = 3
+
+# 在redis服务端原子地完成：检查发送频率、校验并删除图形验证码、保存短信验证码和发送标记
+# KEYS: send_flag_<mobile>, img_<uuid>, sms_<mobile>
+# ARGV: 用户输入的图形验证码(小写), 短信验证码, 短信验证码有效期, 发送间隔
+SMS_GATE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return 1
+end
+local image_code = redis.call('get', KEYS[2])
+if not image_code then
+    return 2
+end
+redis.call('del', KEYS[2])
+if string.lower(image_code) ~= ARGV[1] then
+    return 3
+end
+redis.call('setex', KEYS[3], ARGV[3], ARGV[2])
+redis.call('setex', KEYS[1], ARGV[4], 1)
+return 0
+"""
+
+_sms_gate_script = None
+
+
+def check_and_save_sms_code(redis_conn, mobile, uuid, image_code, sms_code):
+    """
+    一次往返完成短信发送前的全部校验，并发请求不会重复发送短信
+    :param redis_conn: verify_code库的redis连接
+    :param mobile: 手机号
+    :param uuid: 图形验证码的uuid
+    :param image_code: 用户输入的图形验证码
+    :param sms_code: 新生成的短信验证码
+    :return: SMS_GATE_*
+    """
+    global _sms_gate_script
+    if _sms_gate_script is None:
+        _sms_gate_script = redis_conn.register_script(SMS_GATE_SCRIPT)
+    return _sms_gate_script(
+        keys=['send_flag_%s' % mobile, 'img_%s' % uuid, 'sms_%s' % mobile],
+        args=[image_code.lower(), sms_code, constants.SMS_CODE_REDIS_EXPIRES, constants.SEND_SMS_CODE_INTERVAL],
+        client=redis_conn,
+    )
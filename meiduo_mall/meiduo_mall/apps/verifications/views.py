@@ -2,12 +2,13 @@ from django.shortcuts import render
 from django.views import View
 from django_redis import get_redis_connection
 from django import http
-import random, logging
+import random, logging, time
 
 from verifications.libs.captcha.captcha import captcha
+from verifications.utils import pop_captcha, check_and_save_sms_code
+from verifications.utils import SMS_GATE_THROTTLED, SMS_GATE_IMAGE_CODE_EXPIRED, SMS_GATE_IMAGE_CODE_ERROR
 from . import constants
 from meiduo_mall.utils.response_code import RETCODE
-from verifications.libs.yuntongxun.ccp_sms import CCP
 from celery_tasks.sms.tasks import send_sms_code
 # Create your views here.
 
@@ -22,40 +23,36 @@ class SMSCodeView(View):
         if not all([image_code_client, uuid]):
             return http.HttpResponseForbidden('缺少必传参数')
 
+        sms_code = '%06d' % random.randint(0, 999999)
+
+        # 校验发送频率和图形验证码，并保存短信验证码：一次redis往返，原子执行
         redis_conn = get_redis_connection('verify_code')
-        send_flag = redis_conn.get('send_flag_%s' % mobile)
-        if send_flag:
+        result = check_and_save_sms_code(redis_conn, mobile, uuid, image_code_client, sms_code)
+        if result == SMS_GATE_THROTTLED:
             return http.JsonResponse({'code': RETCODE.THROTTLINGERR, 'errmsg': '发送短信过于频繁'})
-
-        image_code_server = redis_conn.get('img_%s' % uuid)
-        if image_code_server is None:
+        if result == SMS_GATE_IMAGE_CODE_EXPIRED:
             return http.JsonResponse({'code': RETCODE.IMAGECODEERR, 'errmsg': '图形验证码已失效'})
-        redis_conn.delete('img_%s' % uuid)
-
-        image_code_server = image_code_server.decode()
-        if image_code_client.lower() != image_code_server.lower():
+        if result == SMS_GATE_IMAGE_CODE_ERROR:
             return http.JsonResponse({'code': RETCODE.IMAGECODEERR, 'errmsg': '输入图形验证码有误'})
 
-        sms_code = '%06d' % random.randint(0, 999999)
         logger.info(sms_code)
 
-        pl = redis_conn.pipeline()
-        pl.setex('sms_%s' % mobile, constants.SMS_CODE_REDIS_EXPIRES, sms_code)
-        pl.setex('send_flag_%s' % mobile, constants.SEND_SMS_CODE_INTERVAL, 1)
-        pl.execute()
-
-        # 发送短信验证码
-        # CCP().send_template_sms(mobile, [sms_code, constants.SMS_CODE_REDIS_EXPIRES // 60], constants.SEND_SMS_TEMPLATE_ID)
         # 使用celery发送短信验证码
-        send_sms_code.delay(mobile, sms_code)  # 千万不要忘记delay
+        # 带上验证码失效时间，队列积压到失效之后的短信不再发送
+        send_sms_code.delay(mobile, sms_code, time.time() + constants.SMS_CODE_REDIS_EXPIRES)  # 千万不要忘记delay
 
         return http.JsonResponse({'code': RETCODE.OK, 'errmsg': '发送短信成功'})
 
 
 class ImageCodeView(View):
     def get(self, request, uuid):
-        text, image = captcha.generate_captcha()
         redis_conn = get_redis_connection('verify_code')
+        # 优先使用预先生成的验证码，验证码池为空时才现场生成
+        pooled = pop_captcha(redis_conn)
+        if pooled:
+            text, image = pooled
+        else:
+            text, image = captcha.generate_captcha()
         redis_conn.setex('img_%s' % uuid, constants.IMAGE_CODE_REDIS_EXPIRES, text)
 
         return http.HttpResponse(image, content_type='image/jpg')
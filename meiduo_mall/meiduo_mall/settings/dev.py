@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
 import os, sys
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -57,6 +58,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # 签名cookie中的登录身份，只需要身份信息的页面不必读取session和查询用户表；去掉即关闭
+    'meiduo_mall.utils.auth_context.AuthContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -140,6 +143,23 @@ SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "session"
 
 
+# 密码哈希器，第一个用于生成新哈希；其余哈希器生成的旧哈希在登录成功时自动按第一个重新生成
+# Argon2和bcrypt是可选依赖（argon2-cffi、bcrypt），未安装时跳过
+PASSWORD_HASHERS = [
+    hasher for hasher, module in (
+        ('meiduo_mall.utils.hashers.TunedArgon2PasswordHasher', 'argon2'),
+        ('django.contrib.auth.hashers.BCryptSHA256PasswordHasher', 'bcrypt'),
+        ('django.contrib.auth.hashers.PBKDF2PasswordHasher', None),
+        ('django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher', None),
+    ) if module is None or find_spec(module)
+]
+
+# 每个进程同时进行的密码校验数上限，默认为CPU核数；哈希参数不降低，登录高峰时限制哈希计算占用的线程数
+PASSWORD_VERIFY_CONCURRENCY = None
+
+# 等待密码校验槽位的最长时间，单位：秒；超时的登录请求按访问过于频繁返回，不再排队
+PASSWORD_VERIFY_TIMEOUT = 1
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -241,3 +261,13 @@ EMAIL_FROM = 'meiduo<qwerkinglin@163.com>'   # 发件人抬头
 
 # 邮件验证链接
 EMAIL_VERIFY_URL = 'http://127.0.0.1:8000/emails/verification/'
+
+# 短信服务商，按健康分故障转移；BACKEND为celery_tasks.sms.providers中注册的名称或类的导入路径
+# 压测时可以换成 {'BACKEND': 'fake', 'OPTIONS': {'path': '/tmp/meiduo_sms.log'}}
+SMS_PROVIDERS = [
+    {
+        'BACKEND': 'yuntongxun',
+        'OPTIONS': {'timeout': 5},
+        'RATE_LIMIT': 50,
+    },
+]
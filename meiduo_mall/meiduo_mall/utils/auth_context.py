@@ -0,0 +1,128 @@
+# 签名cookie中的登录用户身份：只需要身份信息的页面不必读取redis中的session和查询用户表
+# cookie只签名不加密，只保存身份信息；手机号、邮箱等个人信息不写入cookie，由进程内缓存提供
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+# 身份cookie名
+AUTH_CONTEXT_COOKIE = 'auth_context'
+# 签名的salt，与其他签名数据区分
+AUTH_CONTEXT_SALT = 'meiduo_mall.auth_context'
+# 身份信息有效期，单位：秒；过期后重新从session和用户表加载，修改密码等操作最多延迟这么久生效
+AUTH_CONTEXT_MAX_AGE = getattr(settings, 'AUTH_CONTEXT_MAX_AGE', 300)
+
+# 进程内缓存的用户数上限
+AUTH_CONTEXT_CACHE_SIZE = getattr(settings, 'AUTH_CONTEXT_CACHE_SIZE', 10000)
+
+# 进程内LRU缓存：{user_id: (过期时间, 时间戳, mobile, email)}
+# 时间戳为读取手机号和邮箱的时间，单位：毫秒；身份cookie中记录写入cookie时的时间戳，
+# 缓存的时间戳早于cookie中的时间戳时，说明其他进程修改过手机号或邮箱，按未命中处理
+_contacts = OrderedDict()
+_contacts_lock = threading.Lock()
+
+
+def _now_stamp():
+    return int(time.time() * 1000)
+
+
+def _cache_contact(user_id, stamp, mobile, email):
+    with _contacts_lock:
+        _contacts[user_id] = (time.monotonic() + AUTH_CONTEXT_MAX_AGE, stamp, mobile, email)
+        _contacts.move_to_end(user_id)
+        while len(_contacts) > AUTH_CONTEXT_CACHE_SIZE:
+            _contacts.popitem(last=False)
+
+
+def get_user_contact(user_id, stamp=0):
+    """
+    读取用户的手机号和邮箱：优先使用进程内缓存，未命中、过期或早于stamp时查询一次用户表
+    :param stamp: 身份cookie中的时间戳，缓存的数据必须不早于该时间读取
+    :return: (mobile, email)，用户不存在时为(None, None)
+    """
+    with _contacts_lock:
+        entry = _contacts.get(user_id)
+        if entry is not None and entry[0] > time.monotonic() and entry[1] >= stamp:
+            _contacts.move_to_end(user_id)
+            return entry[2:]
+    # 先取时间戳再查询，保证缓存中的数据不早于记录的时间戳
+    loaded_at = _now_stamp()
+    contact = get_user_model().objects.filter(id=user_id).values_list('mobile', 'email').first() or (None, None)
+    _cache_contact(user_id, loaded_at, *contact)
+    return contact
+
+
+def clear_user_contacts():
+    """清空进程内缓存"""
+    with _contacts_lock:
+        _contacts.clear()
+
+
+class AuthContext(namedtuple('AuthContext', ['id', 'username', 'email_active', 'contact_stamp'])):
+    """与User同名的属性，视图中可以和request.user互换使用"""
+    __slots__ = ()
+
+    @property
+    def mobile(self):
+        return get_user_contact(self.id, self.contact_stamp)[0]
+
+    @property
+    def email(self):
+        return get_user_contact(self.id, self.contact_stamp)[1]
+
+
+def _session_digest(session_key):
+    # 身份cookie与session绑定：退出登录或session更换后自动失效
+    return hashlib.sha256((session_key or '').encode()).hexdigest()[:16]
+
+
+def set_auth_context(response, request, user):
+    """
+    登录、注册或用户信息变化后写入身份cookie，同时刷新当前进程缓存的手机号和邮箱
+    cookie中的时间戳让其他进程中更早缓存的手机号和邮箱失效
+    """
+    stamp = _now_stamp()
+    value = [user.id, user.username, user.email_active, stamp, _session_digest(request.session.session_key)]
+    _cache_contact(user.id, stamp, user.mobile, user.email)
+    response.set_cookie(AUTH_CONTEXT_COOKIE, signing.dumps(value, salt=AUTH_CONTEXT_SALT, compress=True),
+                        httponly=True)
+    return response
+
+
+def delete_auth_context(response):
+    """退出登录、修改密码或用户信息变化后删除身份cookie"""
+    response.delete_cookie(AUTH_CONTEXT_COOKIE)
+    return response
+
+
+def get_auth_context(request):
+    """
+    读取并校验身份cookie，只计算签名，不访问redis和数据库
+    :return: AuthContext，cookie不存在、签名无效、已过期或与当前session不符时为None
+    """
+    value = request.COOKIES.get(AUTH_CONTEXT_COOKIE)
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not value or not session_key:
+        return None
+    try:
+        *fields, digest = signing.loads(value, salt=AUTH_CONTEXT_SALT, max_age=AUTH_CONTEXT_MAX_AGE)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if digest != _session_digest(session_key) or len(fields) != len(AuthContext._fields):
+        return None
+    return AuthContext(*fields)
+
+
+class AuthContextMiddleware(object):
+    """为每个请求设置request.auth_context，放在SessionMiddleware之后"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.auth_context = get_auth_context(request)
+        return self.get_response(request)
@@ -0,0 +1,79 @@
+# 基于redis位图的布隆过滤器
+import hashlib
+import math
+
+# 只在位图已存在时置位：过滤器未建立或key丢失时，只写入新元素的位图会被contains()当作已建立的过滤器
+ADD_IF_EXISTS_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV do
+    redis.call('setbit', KEYS[1], ARGV[i], 1)
+end
+return 1
+"""
+
+
+class BloomFilter(object):
+    """
+    redis位图布隆过滤器：contains()为False时一定不存在，为True时可能存在
+    位数组长度和哈希次数由容量和误判率算出，修改这两个参数后需要重建过滤器
+    :param redis_conn: redis连接
+    :param key: 位图的key
+    :param capacity: 预计元素个数
+    :param error_rate: 元素个数不超过capacity时的误判率
+    """
+
+    def __init__(self, redis_conn, key, capacity, error_rate=0.001):
+        self.redis_conn = redis_conn
+        self.key = key
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+
+    def _offsets(self, value):
+        # 双重哈希：一次md5得到两个64位哈希值，组合出hash_count个位置
+        digest = hashlib.md5(str(value).encode()).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, *values, key=None):
+        """
+        添加元素，一次redis往返；过滤器尚未建立时不做任何修改，等待rebuild()
+        :return: 是否已添加
+        """
+        offsets = [offset for value in values for offset in self._offsets(value)]
+        if not offsets:
+            return False
+        return bool(self.redis_conn.eval(ADD_IF_EXISTS_SCRIPT, 1, key or self.key, *offsets))
+
+    def contains(self, value):
+        """
+        判断元素是否可能存在，一次redis往返
+        :return: False一定不存在，True可能存在，None过滤器尚未建立
+        """
+        pl = self.redis_conn.pipeline(transaction=False)
+        pl.exists(self.key)
+        for offset in self._offsets(value):
+            pl.getbit(self.key, offset)
+        built, *bits = pl.execute()
+        if not built:
+            return None
+        return all(bits)
+
+    def rebuild(self, batches):
+        """
+        在临时key上重建过滤器，完成后RENAME原子替换，重建期间线上过滤器照常使用
+        :param batches: 可迭代对象，每次产出一批元素
+        :return: 添加的元素个数
+        """
+        tmp_key = self.key + '_tmp'
+        self.redis_conn.delete(tmp_key)
+        # 预先分配位图：add()只写入已存在的key，元素为空时也能RENAME
+        self.redis_conn.setbit(tmp_key, self.size - 1, 0)
+        count = 0
+        for values in batches:
+            self.add(*values, key=tmp_key)
+            count += len(values)
+        self.redis_conn.rename(tmp_key, self.key)
+        return count
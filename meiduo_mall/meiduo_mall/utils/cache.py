@@ -0,0 +1,115 @@
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('django')
+
+# 进程内按key分段的锁，同一进程内的并发未命中只放行一个线程去加载数据
+_local_locks = [threading.Lock() for _ in range(64)]
+
+
+def _get_local_lock(key):
+    return _local_locks[hash(key) % len(_local_locks)]
+
+
+# 只删除自己持有的锁：加载耗时超过锁有效期时，锁可能已被其他进程重新获取
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_lock(redis_conn, key, timeout):
+    """
+    redis SET NX EX锁
+    :return: 锁的令牌，获取失败为None
+    """
+    token = uuid.uuid4().hex
+    if redis_conn.set(key, token, nx=True, ex=timeout):
+        return token
+    return None
+
+
+def release_lock(redis_conn, key, token):
+    """令牌一致时才释放锁"""
+    redis_conn.eval(RELEASE_LOCK_SCRIPT, 1, key, token)
+
+
+def jitter_timeout(timeout, jitter=0.1):
+    """给缓存有效期加上随机抖动，避免同一批key同时过期"""
+    return max(1, int(timeout * (1 + random.uniform(-jitter, jitter))))
+
+
+def _should_refresh(entry, beta):
+    """概率性提前刷新：越接近过期、加载越慢，越可能提前刷新"""
+    value, delta, expire_at = entry
+    return time.time() - delta * beta * math.log(1 - random.random()) >= expire_at
+
+
+def _load(cache, key, loader, timeout, jitter):
+    """调用loader加载数据并写入缓存"""
+    start = time.time()
+    value = loader()
+    delta = time.time() - start
+    timeout = jitter_timeout(timeout, jitter)
+    cache.set(key, (value, delta, time.time() + timeout), timeout)
+    return value
+
+
+def get_or_set(key, loader, timeout, alias='default', lock_timeout=10, beta=1.0, jitter=0.1):
+    """
+    带单飞保护的cache-aside读取
+    :param key: 缓存key
+    :param loader: 缓存未命中时加载数据的函数
+    :param timeout: 缓存有效期，单位：秒，实际有效期会加上随机抖动
+    :param alias: 缓存别名
+    :param lock_timeout: 加载锁的有效期，也是等待其他进程加载的最长时间，单位：秒
+    :param beta: 提前刷新系数，越大越倾向于提前刷新
+    :param jitter: 有效期抖动比例
+    :return: 缓存数据
+    """
+    cache = caches[alias]
+
+    entry = cache.get(key)
+    if entry is not None and not _should_refresh(entry, beta):
+        return entry[0]
+
+    with _get_local_lock(key):
+        # 等锁期间可能已经被其他线程加载好了
+        entry = cache.get(key)
+        if entry is not None and not _should_refresh(entry, beta):
+            return entry[0]
+
+        # redis SET NX锁：多个进程之间只放行一个去加载数据
+        redis_conn = get_redis_connection(alias)
+        lock_key = 'lock_%s' % key
+        token = acquire_lock(redis_conn, lock_key, lock_timeout)
+        if token:
+            try:
+                return _load(cache, key, loader, timeout, jitter)
+            finally:
+                release_lock(redis_conn, lock_key, token)
+
+        # 其他进程正在刷新，有旧数据时直接返回旧数据
+        if entry is not None:
+            return entry[0]
+
+        # 没有旧数据时等待其他进程加载完成
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+
+        # 等待超时，自己加载
+        logger.warning('等待缓存加载超时：%s' % key)
+        return _load(cache, key, loader, timeout, jitter)
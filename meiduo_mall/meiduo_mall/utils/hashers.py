@@ -0,0 +1,71 @@
+# 密码哈希：Argon2id哈希器，以及限制并发的密码校验
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+from django.utils.encoding import force_bytes
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id哈希器，需要安装argon2-cffi；Django 1.11的Argon2PasswordHasher固定使用Argon2i
+    参数为Argon2id推荐的最低值：内存19MiB，迭代2次，并行度1，每次校验只占用一个核心
+    算法名仍为argon2，原有的argon2i哈希照常校验，并在用户下次登录成功时按新类型和参数重新生成
+    """
+    time_cost = 2
+    memory_cost = 19456
+    parallelism = 1
+    variety = 'argon2id'
+
+    def encode(self, password, salt):
+        argon2 = self._load_library()
+        data = argon2.low_level.hash_secret(
+            force_bytes(password),
+            force_bytes(salt),
+            time_cost=self.time_cost,
+            memory_cost=self.memory_cost,
+            parallelism=self.parallelism,
+            hash_len=argon2.DEFAULT_HASH_LENGTH,
+            type=argon2.low_level.Type.ID,
+        )
+        return self.algorithm + data.decode('ascii')
+
+    def verify(self, password, encoded):
+        argon2 = self._load_library()
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        # 按哈希中记录的类型校验
+        hash_type = argon2.low_level.Type.ID if rest.startswith(self.variety + '$') else argon2.low_level.Type.I
+        try:
+            return argon2.low_level.verify_secret(force_bytes('$' + rest), force_bytes(password), type=hash_type)
+        except argon2.exceptions.VerificationError:
+            return False
+
+    def must_update(self, encoded):
+        variety = self._decode(encoded)[1]
+        return variety != self.variety or super(TunedArgon2PasswordHasher, self).must_update(encoded)
+
+
+class PasswordVerifyBusy(Exception):
+    """等待校验槽位超时"""
+
+
+# 同时进行的密码校验数上限：登录高峰时哈希计算最多占用这么多个线程
+# 多线程部署时才有意义，单线程的prefork worker每个进程同时只处理一个请求
+_verify_semaphore = threading.BoundedSemaphore(getattr(settings, 'PASSWORD_VERIFY_CONCURRENCY', None) or os.cpu_count() or 1)
+
+
+def check_user_password(user, password):
+    """
+    在有上限的校验槽位中校验用户密码，哈希计算仍在当前请求线程中进行
+    等待槽位超过PASSWORD_VERIFY_TIMEOUT秒时抛出PasswordVerifyBusy，不让等待的请求一直占用线程
+    哈希器或参数与PASSWORD_HASHERS中的首选项不同时，校验成功后自动重新生成哈希并保存
+    :return: 密码是否正确
+    """
+    if not _verify_semaphore.acquire(timeout=getattr(settings, 'PASSWORD_VERIFY_TIMEOUT', 1)):
+        raise PasswordVerifyBusy()
+    try:
+        return user.check_password(password)
+    finally:
+        _verify_semaphore.release()
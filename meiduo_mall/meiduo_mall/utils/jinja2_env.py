@@ -1,9 +1,14 @@
-from jinja2 import Environment
+from jinja2 import Environment, FileSystemBytecodeCache, select_autoescape
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.urls import reverse
 
 
 def jinja2_environment(**options):
+    # 纯文本模板（如邮件的.txt正文）不转义，其余模板保持转义
+    if options.get('autoescape') is True:
+        options['autoescape'] = select_autoescape(disabled_extensions=('txt',), default_for_string=True, default=True)
+    # 编译后的模板字节码缓存到临时目录，进程重启后不必重新编译
+    options.setdefault('bytecode_cache', FileSystemBytecodeCache())
     env = Environment(**options)
     env.globals.update({
         'static': staticfiles_storage.url,
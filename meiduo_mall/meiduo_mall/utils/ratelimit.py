@@ -0,0 +1,76 @@
+# 基于redis有序集合的滑动窗口限流
+import logging
+import time
+import uuid
+
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('django')
+
+# KEYS: 每个限流维度一个有序集合
+# ARGV: 当前时间(毫秒), 本次请求的唯一标识, 之后每个key依次为 次数上限, 窗口长度(毫秒)
+# 返回：0表示放行并记录本次请求；否则返回第一个超限的key的序号（从1开始），不记录本次请求
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[1 + i * 2])
+    local window = tonumber(ARGV[2 + i * 2])
+    redis.call('zremrangebyscore', key, 0, now - window)
+    if redis.call('zcard', key) >= limit then
+        return i
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('zadd', key, now, ARGV[2])
+    redis.call('pexpire', key, ARGV[2 + i * 2])
+end
+return 0
+"""
+
+
+class SlidingWindowRateLimiter(object):
+    """
+    滑动窗口限流器：多个维度在一次redis往返中同时检查和计数，任一维度超限则拒绝
+    limiter = SlidingWindowRateLimiter('login', {'ip': (30, 60), 'account': (5, 60)})
+    limiter.allow(ip='127.0.0.1', account='zhangsan')
+    :param name: 限流场景名，作为key前缀
+    :param rules: {维度: (窗口内次数上限, 窗口长度秒数)}
+    :param alias: redis连接别名
+    """
+
+    def __init__(self, name, rules, alias='default'):
+        self.name = name
+        self.rules = rules
+        self.alias = alias
+        self._script = None
+
+    def allow(self, **identities):
+        """
+        检查并记录一次请求，未在rules中的维度和值为空的维度忽略；redis不可用时放行
+        :return: 是否放行
+        """
+        keys, args = [], []
+        for dimension, value in sorted(identities.items()):
+            if dimension not in self.rules or not value:
+                continue
+            limit, window = self.rules[dimension]
+            keys.append('ratelimit_%s_%s_%s' % (self.name, dimension, value))
+            args.extend([limit, int(window * 1000)])
+        if not keys:
+            return True
+
+        try:
+            redis_conn = get_redis_connection(self.alias)
+            if self._script is None:
+                self._script = redis_conn.register_script(SLIDING_WINDOW_SCRIPT)
+            result = self._script(keys=keys, args=[int(time.time() * 1000), uuid.uuid4().hex] + args,
+                                  client=redis_conn)
+        except Exception as e:
+            logger.error(e)
+            return True
+        return result == 0
+
+
+def get_client_ip(request):
+    """客户端IP"""
+    return request.META.get('REMOTE_ADDR')
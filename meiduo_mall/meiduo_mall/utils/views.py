@@ -1,6 +1,7 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django import http
 
+from meiduo_mall.utils.auth_context import set_auth_context
 from meiduo_mall.utils.response_code import RETCODE
 
 
@@ -13,6 +14,23 @@ class LoginRequiredJSONMixin(LoginRequiredMixin):
         return http.JsonResponse({'code': RETCODE.SESSIONERR, 'errmsg': '用户未登陆'})
 
 
+class AuthContextLoginRequiredMixin(LoginRequiredMixin):
+    """
+    只需要登录用户身份信息的视图使用：
+    身份cookie有效时直接使用request.auth_context，不读取session、不查询用户表，手机号和邮箱来自进程内缓存；
+    否则按LoginRequiredMixin判断登录，并在响应中写入新的身份cookie
+    视图中通过getattr(request, 'auth_context', None) or request.user读取身份信息
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if getattr(request, 'auth_context', None):
+            return super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+        response = super(AuthContextLoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+        if hasattr(request, 'auth_context') and request.user.is_authenticated:
+            set_auth_context(response, request, request.user)
+        return response
+
+
 """
 def handle_no_permission(self):
     if self.raise_exception: